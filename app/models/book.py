@@ -1,149 +1,357 @@
-import json
 import os
 import random
+import sys
+from app.models import recommendation_cache
+from app.models.catalog import Catalog
+from app.models.prefix_index import PrefixIndex
+from app.models.sampler import BookSampler
+from app.models.settings import Settings
+from app.models.user import User
+from app.models.tag_index import TagIndex
+from app.services.fuzzy_search import TrigramIndex, NUMPY_AVAILABLE as FUZZY_AVAILABLE
+from app.services.recommender import TagAffinityEngine, NUMPY_AVAILABLE, pick_top
+from app.services.similarity import SimilarityIndex, SCIPY_AVAILABLE
+from app.services import bm25
+from app.services.recommendation_store import RecommendationStore
+from app.storage import cache_dir, get_storage
+from app.storage.descriptions import EXCERPT_LENGTH
+
+# Share of the personal recommendation score taken from co-favorites (the rest is tag affinity)
+CO_FAVORITE_WEIGHT = 0.5
+
+def _intern_tags(tag):
+    """Tag names repeat across the whole catalog, share one string per tag"""
+    return [sys.intern(t) for t in tag] if tag else []
 
 class Book:
-    def __init__(self, id, judul, penulis, tag, foto, deskripsi_singkat):
+    # Slots keep per-book overhead small in the cached catalog; the English
+    # names below are read-only aliases, not separate attributes
+    __slots__ = ('id', 'judul', 'penulis', 'tag', 'foto', '_deskripsi_singkat', 'deskripsi_cuplikan')
+
+    def __init__(self, id, judul, penulis, tag, foto, deskripsi_singkat, deskripsi_cuplikan=None):
         self.id = id
         self.judul = judul
         self.penulis = penulis
-        self.tag = tag
+        self.tag = _intern_tags(tag)
         self.foto = foto
-        self.deskripsi_singkat = deskripsi_singkat
+        # None means the description stays in storage until it is read
+        self._deskripsi_singkat = deskripsi_singkat
+        self.deskripsi_cuplikan = deskripsi_cuplikan if deskripsi_cuplikan is not None else (deskripsi_singkat or '')[:EXCERPT_LENGTH]
 
-        # Backward compatibility properties
-        self.title = judul
-        self.author = penulis
-        self.genre = tag
-        self.cover_image = foto
-        self.description = deskripsi_singkat
+    @property
+    def deskripsi_singkat(self):
+        """Full description, read from the description store on demand"""
+        if self._deskripsi_singkat is not None:
+            return self._deskripsi_singkat
+        return get_storage().load_description(self.id) or ''
 
-    @staticmethod
-    def get_books_file():
-        return 'data/books.json'
+    @deskripsi_singkat.setter
+    def deskripsi_singkat(self, value):
+        self._deskripsi_singkat = value
+        self.deskripsi_cuplikan = (value or '')[:EXCERPT_LENGTH]
+
+    # Backward compatibility properties
+    @property
+    def title(self):
+        return self.judul
+
+    @property
+    def author(self):
+        return self.penulis
+
+    @property
+    def genre(self):
+        return self.tag
+
+    @property
+    def cover_image(self):
+        return self.foto
+
+    @property
+    def description(self):
+        return self.deskripsi_singkat
+
+    @classmethod
+    def _load_books(cls):
+        return [cls.from_dict(book_data) for book_data in get_storage().load_book_summaries()]
+
+    @classmethod
+    def from_dict(cls, book_data):
+        # Handle both old and new data structure
+        if 'judul' in book_data:
+            # New structure; summaries carry only 'deskripsi_cuplikan'
+            return cls(
+                id=book_data['id'],
+                judul=book_data['judul'],
+                penulis=book_data['penulis'],
+                tag=book_data['tag'],
+                foto=book_data['foto'],
+                deskripsi_singkat=book_data.get('deskripsi_singkat'),
+                deskripsi_cuplikan=book_data.get('deskripsi_cuplikan')
+            )
+        # Old structure - convert to new
+        return cls(
+            id=book_data['id'],
+            judul=book_data['title'],
+            penulis=book_data['author'],
+            tag=book_data['genre'],
+            foto=book_data['cover_image'],
+            deskripsi_singkat=book_data.get('description'),
+            deskripsi_cuplikan=book_data.get('deskripsi_cuplikan')
+        )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'judul': self.judul,
+            'penulis': self.penulis,
+            'tag': self.tag,
+            'foto': self.foto,
+            'deskripsi_singkat': self.deskripsi_singkat
+        }
+
+    @classmethod
+    def catalog(cls):
+        """Shared per-process catalog cache"""
+        return _catalog
+
+    @classmethod
+    def cache_stats(cls):
+        return _catalog.stats()
 
     @classmethod
     def get_all(cls):
-        if not os.path.exists(cls.get_books_file()):
-            return []
-        with open(cls.get_books_file(), 'r', encoding='utf-8') as f:
-            books_data = json.load(f)
-            books = []
-            for book_data in books_data:
-                # Handle both old and new data structure
-                if 'judul' in book_data:
-                    # New structure
-                    books.append(cls(
-                        id=book_data['id'],
-                        judul=book_data['judul'],
-                        penulis=book_data['penulis'],
-                        tag=book_data['tag'],
-                        foto=book_data['foto'],
-                        deskripsi_singkat=book_data['deskripsi_singkat']
-                    ))
-                else:
-                    # Old structure - convert to new
-                    books.append(cls(
-                        id=book_data['id'],
-                        judul=book_data['title'],
-                        penulis=book_data['author'],
-                        tag=book_data['genre'],
-                        foto=book_data['cover_image'],
-                        deskripsi_singkat=book_data['description']
-                    ))
-            return books
+        return list(_catalog.books())
+
+    @staticmethod
+    def _collection(pending=None):
+        """Full book list for storage, with ``pending`` replacing (or appended after) its cached record"""
+        books = _catalog.books()
+        if pending is None:
+            return [book.to_dict() for book in books]
+        collection = [pending.to_dict() if book.id == pending.id else book.to_dict() for book in books]
+        if _catalog.get(pending.id) is None:
+            collection.append(pending.to_dict())
+        return collection
 
     @classmethod
     def get(cls, book_id):
-        books = cls.get_all()
-        for book in books:
-            if book.id == book_id:
-                return book
-        return None
+        return _catalog.get(book_id)
 
     @classmethod
-    def get_random(cls, count=6):
-        books = cls.get_all()
-        if len(books) <= count:
-            return books
-        return random.sample(books, count)
+    def get_many(cls, book_ids):
+        """Return the books for the given ids in the requested order, skipping unknown ids"""
+        return _catalog.get_many(book_ids)
+
+    @classmethod
+    def sampler(cls):
+        """Random sampler over the current catalog"""
+        return _catalog.derived('sampler', BookSampler)
+
+    @classmethod
+    def get_random(cls, count=6, exclude=None, weighting=None):
+        """Random books without copying the catalog.
+
+        ``weighting`` is None (uniform), 'recency' (newer books more likely)
+        or 'popularity' (weighted by how many users favorited a book).
+        ``exclude`` ids are never returned.
+        """
+        with _catalog.lock:
+            sampler = cls.sampler()
+            generation = _catalog.generation
+        cumulative = None
+        if weighting == 'recency':
+            # Books are appended as they are added, so the ordinal tracks age
+            cumulative = sampler.cumulative('recency', generation, lambda ordinal, book: ordinal + 1)
+        elif weighting == 'popularity':
+            users_generation, counts = User.favorite_counts()
+            cumulative = sampler.cumulative('popularity', (generation, users_generation),
+                                            lambda ordinal, book: 1 + counts.get(book.id, 0))
+        return sampler.sample(count, exclude or (), cumulative)
+
+    @classmethod
+    def tag_index(cls):
+        """Inverted tag index for the current catalog"""
+        return _catalog.derived('tag_index', TagIndex)
+
+    @classmethod
+    def query(cls, any_tags=None, all_tags=None, exclude_ids=None, limit=None):
+        """Books matching any of ``any_tags`` and all of ``all_tags``, in catalog order"""
+        return cls.tag_index().query(any_tags, all_tags, exclude_ids, limit)
 
     @classmethod
     def get_by_genre(cls, tags, exclude_ids=None):
-        if exclude_ids is None:
-            exclude_ids = []
-        books = cls.get_all()
-        filtered_books = []
-        for book in books:
-            if book.id not in exclude_ids:
-                # Check if any of the book's tags match the requested tags
-                if any(tag in book.tag for tag in tags):
-                    filtered_books.append(book)
-        return filtered_books
-
-    @classmethod
-    def get_recommendations_for_user(cls, user):
+        return cls.query(any_tags=tags, exclude_ids=exclude_ids)
+
+    @classmethod
+    def affinity_engine(cls):
+        """Tag-affinity scoring matrix for the current catalog"""
+        return _catalog.derived('affinity_engine', TagAffinityEngine)
+
+    @classmethod
+    def get_recommendations_for_user(cls, user, count=None):
+        if count is None:
+            count = Settings.get_personal_recommendations_count()
         if not user.favorites:
             # If no favorites, return random books
-            return cls.get_random(6)
+            return cls.get_random(count)
 
-        # Get favorite books and extract tags
-        favorite_tags = set()
-        for fav_id in user.favorites:
-            book = cls.get(fav_id)
-            if book:
-                favorite_tags.update(book.tag)
+        # Ranking only changes with the favorites or the catalog; each view just re-picks from it
+        pool_size = count * TagAffinityEngine.TIE_POOL
+        key = _recommendations.key(user.id, user.favorites, _catalog.current_generation())
+        cached = _recommendations.get(key)
+        if cached is not None and cached[0] >= pool_size:
+            ranked = cached[1]
+        else:
+            ranked = cls._precomputed_for_user(user)
+            if ranked is None:
+                ranked = cls._rank_for_user(user, pool_size)
+            _recommendations.put(key, (pool_size, ranked))
+        recommended_books = pick_top(ranked, count)
+
+        # If we don't have enough recommendations, add some random books
+        if len(recommended_books) < count:
+            seen = set(user.favorites)
+            seen.update(book.id for book in recommended_books)
+            recommended_books += cls.get_random(count - len(recommended_books), exclude=seen)
+        return recommended_books
+
+    @classmethod
+    def _rank_for_user(cls, user, pool_size):
+        """Ranked (book, score) candidates for the user, favorites excluded"""
+        if NUMPY_AVAILABLE:
+            # Blend tag affinity with what readers who share these favorites also liked
+            model = user.co_favorites()
+            boost = model.scores(user.favorites) if model is not None else None
+            return cls.affinity_engine().rank(user.favorites, pool_size, boost, CO_FAVORITE_WEIGHT)
+        # Without numpy every book sharing a tag ranks equally, so picks are random
+        return [(book, 1.0) for book in cls._tag_matches(user.favorites)]
+
+    @classmethod
+    def _precomputed_for_user(cls, user):
+        """Ranking from the nightly batch, or None if absent or the favorites or catalog changed since"""
+        ranked = _precomputed.lookup(user.id, user.favorites, _catalog.current_signature())
+        if ranked is None:
+            return None
+        books = {book.id: book for book in _catalog.get_many([book_id for book_id, _ in ranked])}
+        return [(books[book_id], score) for book_id, score in ranked if book_id in books]
 
+    @classmethod
+    def invalidate_recommendations(cls, user_id):
+        _recommendations.invalidate(user_id)
+
+    @classmethod
+    def recommendation_cache_stats(cls):
+        return dict(_recommendations.stats(), precomputed=_precomputed.stats())
+
+    @classmethod
+    def _tag_matches(cls, favorite_ids, count=None):
+        """Random books sharing a tag with the favorites (used without numpy)"""
+        favorite_tags = set()
+        for book in cls.get_many(favorite_ids):
+            favorite_tags.update(book.tag)
         if not favorite_tags:
-            return cls.get_random(6)
+            return []
+        matches = cls.query(any_tags=favorite_tags, exclude_ids=favorite_ids)
+        if count is not None and len(matches) > count:
+            return random.sample(matches, count)
+        random.shuffle(matches)
+        return matches
 
-        # Get books that match favorite tags (excluding already favorited)
-        recommended_books = cls.get_by_genre(list(favorite_tags), exclude_ids=user.favorites)
+    @classmethod
+    def similarity_index(cls):
+        """Content-similarity index (TF-IDF + tags) for the current catalog"""
+        def build(books):
+            return SimilarityIndex(books, lambda book: book.deskripsi_singkat, cache_dir(),
+                                   get_storage().signature('books'))
+        return _catalog.derived('similarity_index', build)
 
-        # If we don't have enough recommendations, add some random books
-        if len(recommended_books) < 6:
-            random_books = cls.get_random(6 - len(recommended_books))
-            for book in random_books:
-                if book.id not in user.favorites and book not in recommended_books:
-                    recommended_books.append(book)
+    @classmethod
+    def get_similar(cls, book_id, limit=3):
+        """Books most similar to ``book_id``, most similar first"""
+        if SCIPY_AVAILABLE:
+            neighbours = cls.similarity_index().similar(book_id, limit)
+            if neighbours:
+                return cls.get_many([neighbour_id for neighbour_id, _ in neighbours])
+            # Not computed yet (new book, neighbour lists still rebuilding): use shared tags meanwhile
+        if NUMPY_AVAILABLE:
+            return cls.affinity_engine().recommend([book_id], limit)
+        return cls._tag_matches([book_id], limit)
 
-        # Shuffle and limit to 6
-        random.shuffle(recommended_books)
-        return recommended_books[:6]
+    @classmethod
+    def prefix_index(cls):
+        """Title/author prefix index for the current catalog"""
+        return _catalog.derived('prefix_index', PrefixIndex)
 
-    def save(self):
-        """Save or update the book in the JSON file"""
-        books = Book.get_all()
-        # Update existing book or add new book
-        for i, book in enumerate(books):
-            if book.id == self.id:
-                books[i] = self
-                break
-        else:
-            books.append(self)
+    @classmethod
+    def autocomplete(cls, query, limit=8):
+        """Books whose title or author has a word starting with ``query``"""
+        return cls.prefix_index().complete(query, limit)
+
+    @classmethod
+    def search_index(cls):
+        """BM25 full-text index for the current catalog"""
+        return _catalog.derived('bm25_index', lambda books: bm25.BM25Index(books, lambda book: book.deskripsi_singkat))
+
+    @classmethod
+    def search(cls, query, limit=30):
+        """Books ranked by BM25 relevance to ``query``; empty without numpy"""
+        if not bm25.NUMPY_AVAILABLE:
+            return []
+        index = cls.search_index()
+        return [index.books[ordinal] for ordinal, _ in index.search(query, limit)]
+
+    @classmethod
+    def catalog_signature(cls):
+        """Storage signature of the books, identical in every worker (unlike the cache generation)"""
+        return get_storage().signature('books')
 
-        # Save to file
-        books_data = []
-        for book in books:
-            books_data.append({
-                'id': book.id,
-                'judul': book.judul,
-                'penulis': book.penulis,
-                'tag': book.tag,
-                'foto': book.foto,
-                'deskripsi_singkat': book.deskripsi_singkat
-            })
+    @classmethod
+    def fuzzy_index(cls):
+        """Typo-tolerant trigram index over titles, authors and tags"""
+        return _catalog.derived('fuzzy_index', TrigramIndex)
+
+    @classmethod
+    def fuzzy_search(cls, query, limit=10):
+        """(book, score, title_score) triples matching ``query`` despite misspellings, empty without numpy.
 
-        with open(self.get_books_file(), 'w', encoding='utf-8') as f:
-            json.dump(books_data, f, indent=2, ensure_ascii=False)
+        ``score`` (0..1) ranks the matches and includes tag hits;
+        ``title_score`` (0..1) counts only the title and author.
+        """
+        if not FUZZY_AVAILABLE:
+            return []
+        index = cls.fuzzy_index()
+        return [(index.books[ordinal], score, title_score)
+                for ordinal, score, title_score in index.search(query, limit)]
+
+    def save(self):
+        """Save or update the book in storage, then put it in the catalog"""
+        with _catalog.lock:
+            # The catalog only changes once the write has succeeded
+            _catalog.mark_written(get_storage().save_book(self.to_dict(), lambda: Book._collection(self)))
+            _catalog.upsert(self)
+        _recommendations.clear()
 
     @classmethod
     def create(cls, judul, penulis, tag, foto, deskripsi_singkat):
         """Create a new book and save it"""
-        # Generate new ID
-        books = cls.get_all()
+        with _catalog.lock:
+            book = cls(
+                id=cls._next_id(),
+                judul=judul,
+                penulis=penulis,
+                tag=tag,
+                foto=foto,
+                deskripsi_singkat=deskripsi_singkat
+            )
+            book.save()
+        return book
+
+    @classmethod
+    def _next_id(cls):
+        """Generate new ID"""
         max_id = 0
-        for book in books:
+        for book in _catalog.books():
             try:
                 book_id = int(book.id)
                 if book_id > max_id:
@@ -151,10 +359,17 @@ class Book:
             except ValueError:
                 pass
 
-        new_id = str(max_id + 1)
+        return str(max_id + 1)
+
+    def update(self, judul, penulis, tag, foto, deskripsi_singkat):
+        """Save the edited details as a new Book and return it.
 
-        book = cls(
-            id=new_id,
+        This Book may be the shared cached instance other requests are
+        reading, so it is left as is; the updated copy replaces it in the
+        catalog after the storage write succeeds.
+        """
+        book = Book(
+            id=self.id,
             judul=judul,
             penulis=penulis,
             tag=tag,
@@ -164,42 +379,17 @@ class Book:
         book.save()
         return book
 
-    def update(self, judul, penulis, tag, foto, deskripsi_singkat):
-        """Update book details and save"""
-        self.judul = judul
-        self.penulis = penulis
-        self.tag = tag
-        self.foto = foto
-        self.deskripsi_singkat = deskripsi_singkat
-
-        # Update backward compatibility properties
-        self.title = judul
-        self.author = penulis
-        self.genre = tag
-        self.cover_image = foto
-        self.description = deskripsi_singkat
-
-        self.save()
-
     @classmethod
     def delete(cls, book_id):
         """Delete a book by ID"""
-        books = cls.get_all()
-        books = [book for book in books if book.id != book_id]
-
-        # Save updated list
-        books_data = []
-        for book in books:
-            books_data.append({
-                'id': book.id,
-                'judul': book.judul,
-                'penulis': book.penulis,
-                'tag': book.tag,
-                'foto': book.foto,
-                'deskripsi_singkat': book.deskripsi_singkat
-            })
-
-        with open(cls.get_books_file(), 'w', encoding='utf-8') as f:
-            json.dump(books_data, f, indent=2, ensure_ascii=False)
-
-        return True
\ No newline at end of file
+        with _catalog.lock:
+            _catalog.remove(book_id)
+            _catalog.mark_written(get_storage().delete_book(book_id, cls._collection))
+        _recommendations.clear()
+
+        return True
+
+
+_catalog = Catalog(Book._load_books, lambda: get_storage().signature('books'))
+_recommendations = recommendation_cache.from_environment()
+_precomputed = RecommendationStore(os.path.join(cache_dir(), 'recommendations.bin'))
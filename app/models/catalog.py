@@ -0,0 +1,161 @@
+import logging
+import os
+import threading
+
+
+class RecordCache:
+    """Process-wide in-memory cache of one storage collection.
+
+    Records are loaded once per worker and reused until the storage
+    signature changes (file mtime/size for JSON, a generation counter for
+    SQLite).  Writes made by this process update the cached list in place,
+    so they never trigger a reload.  A dict index on id is kept alongside
+    the list for O(1) lookups; subclasses add their own indexes through
+    ``_index`` and ``_unindex``.
+    """
+
+    label = 'Records'
+
+    def __init__(self, loader, signature):
+        self._loader = loader
+        self._current_signature = signature
+        self.lock = threading.RLock()
+        self._records = None
+        self._by_id = {}
+        self._signature = None
+        self._derived = {}
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    def records(self):
+        """Return the cached list, reloading it if the storage changed"""
+        signature = self._current_signature()
+        with self.lock:
+            if self._records is not None and signature == self._signature:
+                self.hits += 1
+                return self._records
+
+            self.misses += 1
+            if self._records is not None:
+                self.reloads += 1
+            self._records = self._loader() if signature is not None else []
+            self._by_id = {}
+            self._reset_indexes()
+            for record in self._records:
+                self._by_id[record.id] = record
+                self._index(record)
+            self._signature = signature
+            self.generation += 1
+            logging.info(f"{self.label} loaded: {len(self._records)} records (pid {os.getpid()}, generation {self.generation})")
+            return self._records
+
+    def _reset_indexes(self):
+        pass
+
+    def _index(self, record):
+        pass
+
+    def _unindex(self, record_id):
+        pass
+
+    def current_generation(self):
+        """Generation after picking up any change made by another process"""
+        with self.lock:
+            self.records()
+            return self.generation
+
+    def current_signature(self):
+        """Storage signature of the cached records, after picking up any change made by another process"""
+        with self.lock:
+            self.records()
+            return self._signature
+
+    def derived(self, name, build):
+        """Return build(records), recomputed only when the cache generation changes.
+
+        For read-only structures derived from the whole collection (indexes,
+        matrices); they are rebuilt lazily after a reload or local write.
+        """
+        with self.lock:
+            records = self.records()
+            cached = self._derived.get(name)
+            if cached is not None and cached[0] == self.generation:
+                return cached[1]
+            value = build(records)
+            self._derived[name] = (self.generation, value)
+            return value
+
+    def get(self, record_id):
+        """Look up a single record by id"""
+        with self.lock:
+            self.records()
+            return self._by_id.get(record_id)
+
+    def get_many(self, record_ids):
+        """Look up several records in one pass, keeping the requested order"""
+        with self.lock:
+            self.records()
+            by_id = self._by_id
+        return [by_id[record_id] for record_id in record_ids if record_id in by_id]
+
+    def upsert(self, record):
+        """Replace the record with the same id in place, or append it"""
+        with self.lock:
+            records = self.records()
+            if record.id in self._by_id:
+                if self._by_id[record.id] is not record:
+                    for i, existing in enumerate(records):
+                        if existing.id == record.id:
+                            records[i] = record
+                            break
+                self._unindex(record.id)
+            else:
+                records.append(record)
+            self._by_id[record.id] = record
+            self._index(record)
+            self.generation += 1
+
+    def remove(self, record_id):
+        """Drop a record from the cached list"""
+        with self.lock:
+            records = self.records()
+            if self._by_id.pop(record_id, None) is not None:
+                self._unindex(record_id)
+                records[:] = [record for record in records if record.id != record_id]
+            self.generation += 1
+
+    def mark_written(self, signature):
+        """Record the storage signature produced by this process's own write"""
+        with self.lock:
+            self._signature = signature
+
+    def invalidate(self):
+        """Force the next access to reload from storage"""
+        with self.lock:
+            self._records = None
+            self._by_id = {}
+            self._reset_indexes()
+            self._derived = {}
+            self._signature = None
+
+    def stats(self):
+        with self.lock:
+            return {
+                'pid': os.getpid(),
+                'records': len(self._records) if self._records is not None else 0,
+                'generation': self.generation,
+                'hits': self.hits,
+                'misses': self.misses,
+                'reloads': self.reloads,
+            }
+
+
+class Catalog(RecordCache):
+    """Process-wide cache of the book catalog"""
+
+    label = 'Book catalog'
+
+    def books(self):
+        return self.records()
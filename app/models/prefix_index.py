@@ -0,0 +1,86 @@
+import bisect
+from array import array
+
+from app.services.text_processing import normalize
+
+# Characters compared when sorting; queries longer than this still match, they just scan a little further
+SORT_PREFIX = 24
+
+
+class PrefixIndex:
+    """Word-prefix index over normalised titles and authors.
+
+    All titles and authors are normalised and concatenated into a single
+    string, one field per line.  ``starts`` holds the offset of every word
+    in that string, sorted by the text that follows it, so the words
+    beginning with a query form one contiguous run found with ``bisect``.
+    Apart from the text itself this costs two 4-byte ints per word (the
+    sorted offset and the field start used to map back to a book), which
+    keeps 100k titles within a few MB.
+    """
+
+    TITLE, AUTHOR = 0, 1
+
+    def __init__(self, books):
+        self.books = tuple(books)
+        parts = []
+        field_starts = array('I')
+        # Book ordinal * 2 + field for each entry in field_starts
+        field_owners = array('I')
+        word_starts = array('I')
+        position = 0
+        for ordinal, book in enumerate(self.books):
+            for field, value in ((self.TITLE, book.judul), (self.AUTHOR, book.penulis)):
+                value = ' '.join(normalize(value or '').split())
+                if not value:
+                    continue
+                field_starts.append(position)
+                field_owners.append(ordinal * 2 + field)
+                previous = ' '
+                for offset, char in enumerate(value):
+                    if previous == ' ' and char != ' ':
+                        word_starts.append(position + offset)
+                    previous = char
+                parts.append(value)
+                position += len(value) + 1
+        self.text = '\n'.join(parts) + '\n'
+        self.field_starts = field_starts
+        self.field_owners = field_owners
+        text = self.text
+        self.starts = array('I', sorted(word_starts, key=lambda start: text[start:start + SORT_PREFIX]))
+
+    def _owner(self, start):
+        entry = bisect.bisect_right(self.field_starts, start) - 1
+        owner = self.field_owners[entry]
+        return owner // 2, owner % 2, start == self.field_starts[entry]
+
+    def complete(self, query, limit=8):
+        """Books whose title or author has a word starting with ``query``.
+
+        Title matches rank before author matches and whole-field prefix
+        matches before mid-field ones; shorter titles come first otherwise.
+        """
+        query = ' '.join(normalize(query or '').split())
+        if not query or limit <= 0:
+            return []
+        text, size = self.text, len(query)
+        key = query[:SORT_PREFIX]
+        first = bisect.bisect_left(self.starts, key, key=lambda start: text[start:start + len(key)])
+
+        best = {}
+        # Look at enough matches to rank them; the run for a very short prefix can be long
+        budget = limit * 20
+        starts = self.starts
+        for position in range(first, len(starts)):
+            start = starts[position]
+            if text[start:start + len(key)] != key or not budget:
+                break
+            if size > SORT_PREFIX and text[start:start + size] != query:
+                continue
+            budget -= 1
+            ordinal, field, at_field_start = self._owner(start)
+            rank = (field, not at_field_start, len(self.books[ordinal].judul or ''))
+            if ordinal not in best or rank < best[ordinal]:
+                best[ordinal] = rank
+        ranked = sorted(best, key=best.__getitem__)[:limit]
+        return [self.books[ordinal] for ordinal in ranked]
@@ -0,0 +1,64 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+class RecommendationCache:
+    """Bounded LRU of each user's ranked recommendation candidates.
+
+    Entries are keyed by (user id, hash of the favorites, catalog
+    generation), so a favorite change or any catalog edit simply misses.
+    Only one entry is kept per user; ``invalidate`` drops it eagerly and
+    ``clear`` drops everything after a catalog edit.
+    """
+
+    def __init__(self, max_size=4096):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(user_id, favorites, generation):
+        return (user_id, hash(frozenset(favorites)), generation)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key[0])
+            if entry is not None and entry[0] == key:
+                self._entries.move_to_end(key[0])
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, key, ranked):
+        with self._lock:
+            self._entries[key[0]] = (key, ranked)
+            self._entries.move_to_end(key[0])
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'entries': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+def from_environment():
+    """Cache sized by RECOMMENDATION_CACHE_SIZE"""
+    return RecommendationCache(int(os.environ.get('RECOMMENDATION_CACHE_SIZE', 4096)))
@@ -0,0 +1,69 @@
+import bisect
+import itertools
+import random
+
+
+class BookSampler:
+    """Random sampling over a snapshot of the catalog by ordinal.
+
+    Draws positions in a resident tuple instead of copying the catalog,
+    so a sample costs O(count) (O(count log n) when weighted) regardless
+    of catalog size.  Excluded ids (already shown, favorites) are handled
+    by rejection; only when they cover most of the catalog does it fall
+    back to scanning the remaining books.
+    """
+
+    # Rejected draws tolerated per requested book before falling back to a scan
+    MAX_REJECTIONS = 20
+
+    def __init__(self, books):
+        self.books = tuple(books)
+        self.ordinals = {book.id: ordinal for ordinal, book in enumerate(self.books)}
+        self._cumulative = {}
+
+    def cumulative(self, name, version, weight):
+        """Cumulative weights for ``weight(ordinal, book)``, rebuilt when ``version`` changes"""
+        cached = self._cumulative.get(name)
+        if cached is None or cached[0] != version:
+            totals = list(itertools.accumulate(weight(ordinal, book) for ordinal, book in enumerate(self.books)))
+            cached = self._cumulative[name] = (version, totals)
+        return cached[1]
+
+    def sample(self, count, exclude=(), cumulative=None):
+        """Up to ``count`` distinct books, drawn uniformly or by ``cumulative`` weights"""
+        total = len(self.books)
+        excluded = {self.ordinals[book_id] for book_id in exclude if book_id in self.ordinals}
+        count = min(count, total - len(excluded))
+        if count <= 0:
+            return []
+
+        if cumulative is None and not excluded:
+            return [self.books[ordinal] for ordinal in random.sample(range(total), count)]
+
+        chosen = []
+        seen = set(excluded)
+        weight_total = cumulative[-1] if cumulative else 0
+        attempts = count * self.MAX_REJECTIONS
+        while len(chosen) < count and attempts:
+            attempts -= 1
+            if cumulative is None:
+                ordinal = random.randrange(total)
+            else:
+                ordinal = bisect.bisect_right(cumulative, random.random() * weight_total)
+            if ordinal not in seen:
+                seen.add(ordinal)
+                chosen.append(ordinal)
+
+        if len(chosen) < count:
+            # Most of the catalog is excluded or the weights are very skewed
+            remaining = [ordinal for ordinal in range(total) if ordinal not in seen]
+            if cumulative is None:
+                chosen += random.sample(remaining, count - len(chosen))
+            else:
+                weights = [cumulative[o] - (cumulative[o - 1] if o else 0) for o in remaining]
+                while len(chosen) < count and remaining:
+                    position = random.choices(range(len(remaining)), weights=weights)[0] if any(weights) \
+                        else random.randrange(len(remaining))
+                    chosen.append(remaining.pop(position))
+                    weights.pop(position)
+        return [self.books[ordinal] for ordinal in chosen]
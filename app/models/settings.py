@@ -1,71 +1,149 @@
 import json
 import os
+import threading
+import time
+from app.storage import get_storage
+
+DEFAULT_SETTINGS = {
+    "maintenance_mode": False,
+    "quick_recommendations_count": 7,
+    "personal_recommendations_count": 7,
+    "nlp_candidate_count": 30,
+    "nlp_description_length": 500,
+    "nlp_semantic_threshold": 0.8
+}
+
+# How often (milliseconds) a worker re-checks storage for settings changed
+# elsewhere; this bounds how long a maintenance toggle takes to reach every worker
+CHECK_INTERVAL = int(os.environ.get('SETTINGS_CHECK_INTERVAL_MS', 1000)) / 1000.0
+
+_lock = threading.Lock()
+_snapshot = None
+_signature = None
+_checked_at = 0.0
+generation = 0
+
 
 class Settings:
-    _settings_file = 'data/settings.json'
-    
     @classmethod
     def _load_settings(cls):
-        """Load settings from JSON file"""
-        if not os.path.exists(cls._settings_file):
-            # Create default settings if file doesn't exist
-            default_settings = {
-                "maintenance_mode": False,
-                "quick_recommendations_count": 7,
-                "personal_recommendations_count": 7
-            }
-            cls._save_settings(default_settings)
-            return default_settings
-        
-        try:
-            with open(cls._settings_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError):
-            # Return default settings if file is corrupted
-            return {
-                "maintenance_mode": False,
-                "quick_recommendations_count": 7,
-                "personal_recommendations_count": 7
-            }
-    
+        """Return the cached settings snapshot, re-reading storage only when it changed"""
+        global _snapshot, _signature, _checked_at, generation
+        now = time.monotonic()
+        with _lock:
+            if _snapshot is not None and now - _checked_at < CHECK_INTERVAL:
+                return _snapshot
+            storage = get_storage()
+            signature = storage.signature('settings')
+            _checked_at = now
+            if _snapshot is not None and signature == _signature:
+                return _snapshot
+
+            try:
+                settings = storage.load_settings()
+            except (json.JSONDecodeError, IOError):
+                # Return default settings if file is corrupted; retry on the next check
+                return dict(DEFAULT_SETTINGS)
+
+            if settings is None:
+                # Create default settings if nothing is stored yet
+                settings = dict(DEFAULT_SETTINGS)
+                signature = storage.save_settings(settings)
+
+            _snapshot = settings
+            _signature = signature
+            generation += 1
+            return _snapshot
+
     @classmethod
     def _save_settings(cls, settings):
-        """Save settings to JSON file"""
-        os.makedirs(os.path.dirname(cls._settings_file), exist_ok=True)
-        with open(cls._settings_file, 'w', encoding='utf-8') as f:
-            json.dump(settings, f, ensure_ascii=False, indent=2)
-    
+        """Save settings to storage and publish them as the new snapshot"""
+        global _snapshot, _signature, _checked_at, generation
+        with _lock:
+            _signature = get_storage().save_settings(settings)
+            _snapshot = settings
+            _checked_at = time.monotonic()
+            generation += 1
+
+    @classmethod
+    def _update(cls, **changes):
+        # Copy so readers holding the current snapshot never see a half-applied change
+        settings = dict(cls._load_settings())
+        settings.update(changes)
+        cls._save_settings(settings)
+
+    @classmethod
+    def _get_bool(cls, key):
+        return bool(cls._load_settings().get(key, DEFAULT_SETTINGS[key]))
+
+    @classmethod
+    def _get_int(cls, key):
+        value = cls._load_settings().get(key, DEFAULT_SETTINGS[key])
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return DEFAULT_SETTINGS[key]
+
+    @classmethod
+    def _get_float(cls, key):
+        value = cls._load_settings().get(key, DEFAULT_SETTINGS[key])
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return DEFAULT_SETTINGS[key]
+
     @classmethod
     def is_maintenance_mode(cls):
         """Check if maintenance mode is enabled"""
-        settings = cls._load_settings()
-        return settings.get('maintenance_mode', False)
-    
+        return cls._get_bool('maintenance_mode')
+
     @classmethod
     def set_maintenance_mode(cls, enabled):
         """Enable or disable maintenance mode"""
-        settings = cls._load_settings()
-        settings['maintenance_mode'] = enabled
-        cls._save_settings(settings)
+        cls._update(maintenance_mode=bool(enabled))
         return enabled
-    
+
     @classmethod
     def get_quick_recommendations_count(cls):
         """Get number of quick recommendations to show"""
-        settings = cls._load_settings()
-        return settings.get('quick_recommendations_count', 7)
-    
+        return cls._get_int('quick_recommendations_count')
+
     @classmethod
     def get_personal_recommendations_count(cls):
         """Get number of personal recommendations to show"""
-        settings = cls._load_settings()
-        return settings.get('personal_recommendations_count', 7)
-    
+        return cls._get_int('personal_recommendations_count')
+
+    @classmethod
+    def get_nlp_candidate_count(cls):
+        """Get number of candidate books sent to Gemini per NLP query"""
+        return cls._get_int('nlp_candidate_count')
+
+    @classmethod
+    def get_nlp_description_length(cls):
+        """Get max description characters per candidate in the NLP prompt"""
+        return cls._get_int('nlp_description_length')
+
+    @classmethod
+    def update_nlp_prompt_settings(cls, candidate_count, description_length):
+        """Update the size of the NLP recommendation prompt"""
+        cls._update(nlp_candidate_count=int(candidate_count),
+                    nlp_description_length=int(description_length))
+        return True
+
+    @classmethod
+    def get_nlp_semantic_threshold(cls):
+        """Get the similarity (0-1) at which a paraphrased NLP query reuses a cached answer"""
+        return cls._get_float('nlp_semantic_threshold')
+
+    @classmethod
+    def update_nlp_semantic_threshold(cls, threshold):
+        """Update the semantic NLP cache threshold"""
+        cls._update(nlp_semantic_threshold=float(threshold))
+        return True
+
     @classmethod
     def update_recommendations_count(cls, quick_count, personal_count):
         """Update recommendation counts"""
-        settings = cls._load_settings()
-        settings['quick_recommendations_count'] = quick_count
-        settings['personal_recommendations_count'] = personal_count
-        cls._save_settings(settings)
-        return True
\ No newline at end of file
+        cls._update(quick_recommendations_count=int(quick_count),
+                    personal_recommendations_count=int(personal_count))
+        return True
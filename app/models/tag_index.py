@@ -0,0 +1,77 @@
+class TagIndex:
+    """Inverted tag index over a snapshot of the catalog.
+
+    Each book gets an ordinal (its position in the catalog list) and each
+    tag a posting list stored as a bitset: a Python int whose bit ``i`` is
+    set when book ``i`` carries the tag.  Tag unions, intersections and
+    exclusions are then single big-int ``|``, ``&`` and ``& ~`` operations
+    instead of per-book list scans.  Results come back in catalog order.
+    """
+
+    def __init__(self, books):
+        self.books = tuple(books)
+        self.ordinals = {}
+        members = {}
+        for ordinal, book in enumerate(self.books):
+            self.ordinals[book.id] = ordinal
+            for tag in set(book.tag):
+                members.setdefault(tag, []).append(ordinal)
+        # OR-ing one bit at a time copies an ever larger int (quadratic), so
+        # each bitset is filled in a bytearray and converted once
+        size = (len(self.books) + 7) // 8
+        postings = {}
+        for tag, ordinals in members.items():
+            bits = bytearray(size)
+            for ordinal in ordinals:
+                bits[ordinal >> 3] |= 1 << (ordinal & 7)
+            postings[tag] = int.from_bytes(bits, 'little')
+        self.postings = postings
+        self.all = (1 << len(self.books)) - 1
+
+    def tags(self):
+        return list(self.postings)
+
+    def count(self, tag):
+        return self.postings.get(tag, 0).bit_count()
+
+    def mask(self, any_tags=None, all_tags=None, exclude_ids=None):
+        """Bitset of the books matching the query"""
+        if any_tags is not None:
+            mask = 0
+            for tag in any_tags:
+                mask |= self.postings.get(tag, 0)
+        else:
+            mask = self.all
+        for tag in all_tags or ():
+            mask &= self.postings.get(tag, 0)
+            if not mask:
+                return 0
+        if exclude_ids:
+            excluded = 0
+            for book_id in exclude_ids:
+                ordinal = self.ordinals.get(book_id)
+                if ordinal is not None:
+                    excluded |= 1 << ordinal
+            mask &= ~excluded
+        return mask
+
+    def ordinals_of(self, mask, limit=None):
+        """Ordinals of the set bits in ``mask``, lowest first"""
+        # bin() and str.find run in C, which beats peeling bits off a large int one at a time
+        bits = bin(mask)[:1:-1]
+        result = []
+        position = bits.find('1')
+        while position != -1:
+            result.append(position)
+            if limit is not None and len(result) >= limit:
+                break
+            position = bits.find('1', position + 1)
+        return result
+
+    def query(self, any_tags=None, all_tags=None, exclude_ids=None, limit=None):
+        """Books having any of ``any_tags`` and all of ``all_tags``, minus ``exclude_ids``"""
+        mask = self.mask(any_tags, all_tags, exclude_ids)
+        if not mask:
+            return []
+        books = self.books
+        return [books[ordinal] for ordinal in self.ordinals_of(mask, limit)]
@@ -1,75 +1,173 @@
-import json
-import os
-from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
+import threading
 import uuid
+from app.models.user_directory import UserDirectory
+from app.models import user_session
+from app.services import collaborative
+from app.storage import get_storage
+
+DEFAULT_PROFILE_IMAGE = 'https://via.placeholder.com/40x40/6b7280/ffffff?text=User'
+
+class User:
+    # Slot-based record; implements the Flask-Login user interface directly
+    # because UserMixin has no __slots__ and would bring back a __dict__
+    __slots__ = ('id', 'nama', 'email', 'password_hash', 'favorites', 'profile_image', 'role')
 
-class User(UserMixin):
     def __init__(self, id, nama, email, password_hash, favorites=None, profile_image=None, role='pengguna'):
         self.id = id
         self.nama = nama
         self.email = email
         self.password_hash = password_hash
         self.favorites = favorites or []
-        self.profile_image = profile_image or 'https://via.placeholder.com/40x40/6b7280/ffffff?text=User'
-        self.role = role
+        self.profile_image = profile_image or DEFAULT_PROFILE_IMAGE
+        self.role = role or 'pengguna'
+    
+    # Flask-Login interface
+    is_active = True
+    is_authenticated = True
+    is_anonymous = False
+    
+    def get_id(self):
+        return str(self.id)
+    
+    def __eq__(self, other):
+        if isinstance(other, User):
+            return self.id == other.id
+        return NotImplemented
+    
+    def __hash__(self):
+        return hash(self.id)
     
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
     
     @staticmethod
-    def get_users_file():
-        return 'data/users.json'
+    def _load_users():
+        return [User(**user_data) for user_data in get_storage().load_users()]
+    
+    @classmethod
+    def directory(cls):
+        """Shared per-process user directory"""
+        return _directory
+    
+    @classmethod
+    def cache_stats(cls):
+        return _directory.stats()
+    
+    @classmethod
+    def session_cache_stats(cls):
+        return _sessions.stats()
+    
+    @classmethod
+    def co_favorites(cls):
+        """Co-favorite model, or None without scipy.
+
+        Favorite changes made here are applied to it incrementally; it is
+        rebuilt when the directory reloads (another worker wrote) or after
+        many local changes.
+        """
+        global _co_favorites, _co_favorites_loads
+        if not collaborative.SCIPY_AVAILABLE:
+            return None
+        with _co_favorites_lock, _directory.lock:
+            users = _directory.users()
+            # misses counts full (re)loads of the directory
+            if _co_favorites is None or _co_favorites_loads != _directory.misses or _co_favorites.stale:
+                _co_favorites = collaborative.build_model(users)
+                _co_favorites_loads = _directory.misses
+            return _co_favorites
+    
+    @classmethod
+    def favorite_counts(cls):
+        """(directory generation, {book_id: number of users who favorited it})"""
+        def count(users):
+            counts = {}
+            for user in users:
+                for book_id in user.favorites:
+                    counts[book_id] = counts.get(book_id, 0) + 1
+            return counts
+        with _directory.lock:
+            counts = _directory.derived('favorite_counts', count)
+            return _directory.generation, counts
+    
+    @staticmethod
+    def _favorites_changed(user_id, favorites):
+        model = _co_favorites
+        if model is not None:
+            model.update(user_id, favorites)
     
     @classmethod
     def get_all(cls):
-        if not os.path.exists(cls.get_users_file()):
-            return []
-        with open(cls.get_users_file(), 'r', encoding='utf-8') as f:
-            users_data = json.load(f)
-            return [cls(**user_data) for user_data in users_data]
+        return list(_directory.users())
     
     @classmethod
     def get(cls, user_id):
-        users = cls.get_all()
-        for user in users:
-            if user.id == user_id:
-                return user
-        return None
+        return _directory.get(user_id)
+    
+    @classmethod
+    def get_for_session(cls, user_id):
+        """Load the logged-in user, served from the session cache when fresh"""
+        return _sessions.get(user_id)
     
     @classmethod
     def get_by_email(cls, email):
-        users = cls.get_all()
-        for user in users:
-            if user.email == email:
-                return user
-        return None
+        return _directory.get_by_email(email)
+    
+    @classmethod
+    def get_by_name(cls, nama):
+        """Case-insensitive lookup by display name"""
+        return _directory.get_by_name(nama)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'nama': self.nama,
+            'email': self.email,
+            'password_hash': self.password_hash,
+            'favorites': self.favorites,
+            'profile_image': self.profile_image,
+            'role': self.role
+        }
     
+    @staticmethod
+    def _collection(pending=None):
+        """Full user list for storage, with ``pending`` replacing (or appended after) its cached record"""
+        users = _directory.users()
+        if pending is None:
+            return [user.to_dict() for user in users]
+        collection = [pending.to_dict() if user.id == pending.id else user.to_dict() for user in users]
+        if _directory.get(pending.id) is None:
+            collection.append(pending.to_dict())
+        return collection
+    
+    def _stored(self):
+        """The directory's record for this user, reloaded if another worker wrote.
+
+        A session-cached User may be older than that record, so writes start
+        from it instead of saving the stale object.  Call with the directory
+        lock held.
+        """
+        return _directory.get(self.id) or self
+
+    def _copy(self, **changes):
+        user = User(**self.to_dict())
+        for name, value in changes.items():
+            setattr(user, name, value)
+        return user
+
+    @staticmethod
+    def _install(user):
+        """Swap a written record into the directory; the session cache drops the old one"""
+        _directory.upsert(user)
+        _sessions.discard(user.id)
+
     def save(self):
-        users = User.get_all()
-        # Update existing user or add new user
-        for i, user in enumerate(users):
-            if user.id == self.id:
-                users[i] = self
-                break
-        else:
-            users.append(self)
-        
-        # Save to file
-        users_data = []
-        for user in users:
-            users_data.append({
-                'id': user.id,
-                'nama': user.nama,
-                'email': user.email,
-                'password_hash': user.password_hash,
-                'favorites': user.favorites,
-                'profile_image': user.profile_image,
-                'role': getattr(user, 'role', 'pengguna')
-            })
-        
-        with open(self.get_users_file(), 'w', encoding='utf-8') as f:
-            json.dump(users_data, f, indent=2, ensure_ascii=False)
+        """Save or update the user in storage, then put it in the directory"""
+        with _directory.lock:
+            # Favorites are only changed through add/remove_favorite; keep the stored list
+            self.favorites = list(self._stored().favorites)
+            _directory.mark_written(get_storage().save_user(self.to_dict(), lambda: User._collection(self)))
+            User._install(self)
     
     @classmethod
     def create(cls, nama, email, password):
@@ -84,14 +182,26 @@ class User(UserMixin):
         return user
     
     def add_favorite(self, book_id):
-        if book_id not in self.favorites:
-            self.favorites.append(book_id)
-            self.save()
+        with _directory.lock:
+            user = self._stored()
+            if book_id not in user.favorites:
+                user = user._copy(favorites=user.favorites + [book_id])
+                _directory.mark_written(get_storage().add_favorite(
+                    self.id, book_id, user.to_dict(), lambda: User._collection(user)))
+                User._install(user)
+                User._favorites_changed(self.id, user.favorites)
+            self.favorites = list(user.favorites)
     
     def remove_favorite(self, book_id):
-        if book_id in self.favorites:
-            self.favorites.remove(book_id)
-            self.save()
+        with _directory.lock:
+            user = self._stored()
+            if book_id in user.favorites:
+                user = user._copy(favorites=[favorite for favorite in user.favorites if favorite != book_id])
+                _directory.mark_written(get_storage().remove_favorite(
+                    self.id, book_id, user.to_dict(), lambda: User._collection(user)))
+                User._install(user)
+                User._favorites_changed(self.id, user.favorites)
+            self.favorites = list(user.favorites)
     
     def is_favorite(self, book_id):
         return book_id in self.favorites
@@ -103,38 +213,37 @@ class User(UserMixin):
         return self.role == 'pengguna'
     
     def update(self, nama=None, email=None, role=None, password=None):
-        """Update user information"""
+        """Save the changed user information as a new User and return it.
+
+        This User may be the shared instance handed out by the directory and
+        the session cache, so it is left as is; the updated copy replaces it
+        after the storage write succeeds.
+        """
+        changes = {}
         if nama is not None:
-            self.nama = nama
+            changes['nama'] = nama
         if email is not None:
-            self.email = email
+            changes['email'] = email
         if role is not None:
-            self.role = role
+            changes['role'] = role
         if password is not None:
-            self.password_hash = generate_password_hash(password)
-        self.save()
+            changes['password_hash'] = generate_password_hash(password)
+        user = self._copy(**changes)
+        user.save()
+        return user
     
     @classmethod
     def delete(cls, user_id):
         """Delete a user by ID"""
-        users = cls.get_all()
-        users = [user for user in users if user.id != user_id]
-        
-        # Save updated users list
-        users_data = []
-        for user in users:
-            users_data.append({
-                'id': user.id,
-                'nama': user.nama,
-                'email': user.email,
-                'password_hash': user.password_hash,
-                'favorites': user.favorites,
-                'profile_image': user.profile_image,
-                'role': getattr(user, 'role', 'pengguna')
-            })
-        
-        # Ensure directory exists
-        os.makedirs(os.path.dirname(cls.get_users_file()), exist_ok=True)
-        
-        with open(cls.get_users_file(), 'w', encoding='utf-8') as f:
-            json.dump(users_data, f, indent=2, ensure_ascii=False)
\ No newline at end of file
+        with _directory.lock:
+            _directory.remove(user_id)
+            _sessions.discard(user_id)
+            _directory.mark_written(get_storage().delete_user(user_id, cls._collection))
+            cls._favorites_changed(user_id, [])
+
+
+_directory = UserDirectory(User._load_users, lambda: get_storage().signature('users'))
+_sessions = user_session.from_environment(_directory)
+_co_favorites = None
+_co_favorites_loads = None
+_co_favorites_lock = threading.Lock()
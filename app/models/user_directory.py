@@ -0,0 +1,82 @@
+import bisect
+import itertools
+
+from app.models.catalog import RecordCache
+
+
+def name_key(nama):
+    return nama.casefold() if nama is not None else None
+
+
+class UserDirectory(RecordCache):
+    """Process-wide cache of all users with hash indexes on id, email and name.
+
+    Names are matched case-insensitively (casefolded).  When several users
+    share an email or name the earliest registered one wins, as with the old
+    linear scan, so each index maps a key to the ids under it in
+    registration order.  Indexes are updated incrementally on every
+    upsert/remove.
+    """
+
+    label = 'User directory'
+
+    def __init__(self, loader, signature):
+        super().__init__(loader, signature)
+        self._reset_indexes()
+
+    def _reset_indexes(self):
+        self._by_email = {}
+        self._by_name = {}
+        # Keys each user is indexed under, so stale keys can be dropped after an in-place edit
+        self._keys = {}
+        # Registration order, used to keep the id lists sorted
+        self._seq = {}
+        self._counter = itertools.count()
+
+    @staticmethod
+    def _add(index, key, user_id, seq):
+        ids = index.setdefault(key, [])
+        bisect.insort(ids, user_id, key=seq.__getitem__)
+
+    @staticmethod
+    def _discard(index, key, user_id):
+        ids = index.get(key)
+        if ids and user_id in ids:
+            ids.remove(user_id)
+            if not ids:
+                del index[key]
+
+    def _index(self, user):
+        if user.id not in self._seq:
+            self._seq[user.id] = next(self._counter)
+        email, nama = user.email, name_key(user.nama)
+        self._keys[user.id] = (email, nama)
+        self._add(self._by_email, email, user.id, self._seq)
+        if nama is not None:
+            self._add(self._by_name, nama, user.id, self._seq)
+
+    def _unindex(self, user_id):
+        email, nama = self._keys.pop(user_id, (None, None))
+        self._discard(self._by_email, email, user_id)
+        self._discard(self._by_name, nama, user_id)
+
+    def remove(self, user_id):
+        with self.lock:
+            super().remove(user_id)
+            self._seq.pop(user_id, None)
+
+    def users(self):
+        return self.records()
+
+    def _first(self, index_name, key):
+        with self.lock:
+            # records() may reload and replace the index dicts, so look them up afterwards
+            self.records()
+            ids = getattr(self, index_name).get(key)
+            return self._by_id.get(ids[0]) if ids else None
+
+    def get_by_email(self, email):
+        return self._first('_by_email', email)
+
+    def get_by_name(self, nama):
+        return self._first('_by_name', name_key(nama))
@@ -0,0 +1,80 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class UserSessionCache:
+    """Bounded, TTL'd cache of the users loaded by Flask-Login.
+
+    ``load_user`` runs on every authenticated request.  Within one request
+    Flask-Login already keeps the loaded user on ``g._login_user``, so
+    ``current_user`` never reloads it; this cache covers the lookups across
+    requests.  An entry is reused while it is younger than ``ttl`` seconds
+    and the directory generation it was read at is still current, so
+    writes made by this process (save, favorites, delete) invalidate it
+    immediately.  Changes made by other workers are picked up once the
+    entry expires and the directory checks the storage signature again.
+    """
+
+    def __init__(self, directory, ttl=1.0, max_size=1024):
+        self._directory = directory
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                user, generation, expires = entry
+                if now < expires and generation == self._directory.generation:
+                    self._entries.move_to_end(user_id)
+                    self.hits += 1
+                    return user
+            self.misses += 1
+
+        with self._directory.lock:
+            user = self._directory.get(user_id)
+            generation = self._directory.generation
+        with self._lock:
+            if user is None:
+                self._entries.pop(user_id, None)
+                return None
+            self._entries[user_id] = (user, generation, now + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return user
+
+    def discard(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'entries': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+def from_environment(directory):
+    """Cache sized by USER_CACHE_TTL (seconds) and USER_CACHE_SIZE"""
+    return UserSessionCache(
+        directory,
+        ttl=float(os.environ.get('USER_CACHE_TTL', 1.0)),
+        max_size=int(os.environ.get('USER_CACHE_SIZE', 1024)),
+    )
@@ -0,0 +1,73 @@
+import asyncio
+import concurrent.futures
+import os
+import queue
+import threading
+from typing import Any, AsyncGenerator, Awaitable, Iterator, Optional
+
+_loop = None
+_loop_pid = None
+_lock = threading.Lock()
+# End-of-iteration marker in ``iterate``'s queue
+_END = object()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Shared event loop for this process, running in a background thread.
+
+    Coroutines from all Flask routes run on it, so network calls from
+    concurrent requests overlap and loop-bound async clients are reused.
+    Recreated after fork, since the thread is not copied.
+    """
+    global _loop, _loop_pid
+    with _lock:
+        if _loop is None or _loop_pid != os.getpid():
+            _loop = asyncio.new_event_loop()
+            _loop_pid = os.getpid()
+            threading.Thread(target=_loop.run_forever, name='async-bridge', daemon=True).start()
+        return _loop
+
+
+def run(coro: Awaitable, timeout: Optional[float] = None) -> Any:
+    """Run ``coro`` on the shared loop and wait for it; cancel and raise TimeoutError after ``timeout``"""
+    future = asyncio.run_coroutine_threadsafe(coro, get_loop())
+    try:
+        return future.result(timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise TimeoutError(f"Coroutine did not finish within {timeout} seconds")
+
+
+def iterate(items: AsyncGenerator, timeout: Optional[float] = None) -> Iterator:
+    """Drive async generator ``items`` on the shared loop as a plain generator Flask can stream.
+
+    ``timeout`` bounds the wait per item.  If the caller stops early (e.g.
+    the client disconnects) the async generator is cancelled.
+    """
+    results = queue.Queue()
+
+    async def pump():
+        try:
+            async for item in items:
+                results.put((item, None))
+        except Exception as e:
+            results.put((_END, e))
+        else:
+            results.put((_END, None))
+        finally:
+            await items.aclose()
+
+    future = asyncio.run_coroutine_threadsafe(pump(), get_loop())
+    try:
+        while True:
+            try:
+                item, error = results.get(timeout=timeout)
+            except queue.Empty:
+                raise TimeoutError(f"No item within {timeout} seconds")
+            if item is _END:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        future.cancel()
@@ -0,0 +1,88 @@
+import logging
+import math
+from collections import Counter
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from app.services.text_processing import tokenize
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Standard BM25 parameters
+K1 = 1.5
+B = 0.75
+# Times each field's terms are counted; titles and tags say more than one word of a description
+FIELD_WEIGHTS = (('judul', 3), ('penulis', 1), ('tag', 2), ('deskripsi', 1))
+
+
+class BM25Index:
+    """BM25 inverted index over book titles, authors, tags and descriptions.
+
+    Each term keeps the ordinals of its books and their precomputed BM25
+    weights, so a query only sums the postings of its own terms.
+    """
+
+    def __init__(self, books: Sequence, description: Callable[[object], str]):
+        self.books = tuple(books)
+        documents = []
+        # Approximate prompt length if the whole catalog were sent as is
+        self.full_prompt_chars = 0
+        for book in self.books:
+            text = description(book) or ''
+            fields = {'judul': book.judul or '', 'penulis': book.penulis or '',
+                      'tag': ' '.join(book.tag), 'deskripsi': text}
+            counts = Counter()
+            for field, weight in FIELD_WEIGHTS:
+                for token in tokenize(fields[field]):
+                    counts[token] += weight
+            documents.append(counts)
+            self.full_prompt_chars += prompt_chars(book, text)
+
+        total = len(documents)
+        lengths = [sum(counts.values()) for counts in documents]
+        average = (sum(lengths) / total) if total else 0.0
+        frequency = Counter()
+        for counts in documents:
+            frequency.update(counts.keys())
+
+        postings: Dict[str, Tuple[list, list]] = {}
+        for ordinal, counts in enumerate(documents):
+            norm = K1 * (1 - B + B * lengths[ordinal] / average) if average else K1
+            for term, tf in counts.items():
+                idf = math.log(1 + (total - frequency[term] + 0.5) / (frequency[term] + 0.5))
+                entry = postings.setdefault(term, ([], []))
+                entry[0].append(ordinal)
+                entry[1].append(idf * tf * (K1 + 1) / (tf + norm))
+
+        self.postings = {term: (np.array(ordinals, dtype=np.int32), np.array(weights, dtype=np.float32))
+                         for term, (ordinals, weights) in postings.items()}
+        logging.info(f"Built BM25 index: {total} books, {len(self.postings)} terms")
+
+    def search(self, query: str, limit: int) -> List[Tuple[int, float]]:
+        """Up to ``limit`` (ordinal, score) pairs with the highest BM25 score for the query"""
+        matched = [self.postings[term] for term in set(tokenize(query)) if term in self.postings]
+        if not matched or limit <= 0:
+            return []
+        ordinals = np.concatenate([ordinals for ordinals, _ in matched])
+        weights = np.concatenate([weights for _, weights in matched])
+        candidates, inverse = np.unique(ordinals, return_inverse=True)
+        scores = np.bincount(inverse, weights=weights)
+        if len(candidates) > limit:
+            top = np.argpartition(scores, -limit)[-limit:]
+        else:
+            top = np.arange(len(candidates))
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(int(candidates[i]), float(scores[i])) for i in top]
+
+
+def prompt_chars(book, description: str) -> int:
+    """Approximate length of the book's entry in a Gemini prompt (see _format_books_for_prompt)"""
+    return len(book.id) + len(book.judul or '') + len(book.penulis or '') + len(str(book.tag)) + len(description) + 70
+
+
+def estimate_tokens(chars: int) -> int:
+    """Rough token count for ``chars`` characters (about 4 per token)"""
+    return chars // 4
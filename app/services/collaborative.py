@@ -0,0 +1,142 @@
+import logging
+import threading
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+try:
+    import numpy as np
+    from scipy import sparse
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+    logging.warning("scipy not available, recommendations use tags only")
+
+# Rebuild the base matrix once this many users changed since it was built
+REBUILD_AFTER = 2000
+# Most users followed per favorite book when scoring
+MAX_LIKERS = 2000
+
+
+class CoFavoriteModel:
+    """Item-item collaborative filtering on books favorited together.
+
+    The binary user x book matrix is kept as CSR (a user's favorites) and
+    CSC (the users who favorited a book).  Book j scores, for a user with
+    favorites F, the sum over f in F of cos(f, j) = |U_f & U_j| /
+    sqrt(|U_f| * |U_j|).  Only users who like one of F are touched, so the
+    cost follows their favorites rather than the dataset size.
+
+    Favorite changes after the build go to a per-user overlay (the latest
+    list) and update popularity directly; those users' base rows are
+    ignored when scoring.
+    """
+
+    def __init__(self, users: Iterable[Tuple[str, Sequence[str]]]):
+        self._lock = threading.Lock()
+        self.book_ids: List[str] = []
+        self.book_index: Dict[str, int] = {}
+        self.user_index: Dict[str, int] = {}
+
+        counts = []
+        flat = []
+        user_index = self.user_index
+        for user_id, favorites in users:
+            user_index[user_id] = len(user_index)
+            unique = dict.fromkeys(favorites)
+            counts.append(len(unique))
+            flat.extend(unique)
+        for book_id in dict.fromkeys(flat):
+            self._column(book_id)
+
+        indptr = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        indices = np.fromiter(map(self.book_index.__getitem__, flat), dtype=np.int32, count=len(flat))
+        shape = (len(counts), len(self.book_ids))
+        self.rows = sparse.csr_matrix((np.ones(len(indices), dtype=np.float32), indices, indptr), shape=shape)
+        self.columns = self.rows.tocsc()
+        self.popularity = np.asarray(self.rows.sum(axis=0), dtype=np.float32).ravel()
+        self.changed: Dict[int, np.ndarray] = {}
+        logging.info(f"Built co-favorite model: {shape[0]} users, {shape[1]} books, {len(indices)} favorites")
+
+    def _column(self, book_id: str) -> int:
+        column = self.book_index.get(book_id)
+        if column is None:
+            column = self.book_index[book_id] = len(self.book_ids)
+            self.book_ids.append(book_id)
+        return column
+
+    @property
+    def stale(self) -> bool:
+        return len(self.changed) > REBUILD_AFTER
+
+    def _current(self, row: int) -> np.ndarray:
+        if row in self.changed:
+            return self.changed[row]
+        if row < self.rows.shape[0]:
+            return self.rows.indices[self.rows.indptr[row]:self.rows.indptr[row + 1]]
+        return np.empty(0, dtype=np.int32)
+
+    def update(self, user_id: str, favorites: Sequence[str]):
+        """Record a user's latest favorites (empty once the user is deleted)"""
+        with self._lock:
+            row = self.user_index.setdefault(user_id, len(self.user_index))
+            before = self._current(row)
+            columns = [self._column(book_id) for book_id in dict.fromkeys(favorites)]
+            if len(self.book_ids) > len(self.popularity):
+                self.popularity = np.concatenate([
+                    self.popularity, np.zeros(len(self.book_ids) - len(self.popularity), dtype=np.float32)])
+            after = np.array(columns, dtype=np.int32)
+            np.subtract.at(self.popularity, before, 1.0)
+            np.add.at(self.popularity, after, 1.0)
+            self.changed[row] = after
+
+    def scores(self, favorite_ids: Sequence[str], limit: int = 200) -> Dict[str, float]:
+        """Co-favorite scores of the ``limit`` books most often favorited with ``favorite_ids``"""
+        with self._lock:
+            favorites = np.array([self.book_index[book_id] for book_id in favorite_ids
+                                  if book_id in self.book_index], dtype=np.int32)
+            if not len(favorites):
+                return {}
+            popularity = self.popularity
+            weight = np.zeros(len(popularity), dtype=np.float32)
+            nonzero = popularity[favorites] > 0
+            weight[favorites[nonzero]] = 1.0 / np.sqrt(popularity[favorites[nonzero]])
+
+            # Base users who like one of the favorites, weighted sum(1/sqrt(pop_f));
+            # very popular books are represented by a sample of their users
+            columns = self.columns
+            likers, liker_weights = [np.empty(0, dtype=np.int32)], [np.empty(0, dtype=np.float32)]
+            for f in favorites[favorites < columns.shape[1]]:
+                column = columns.indices[columns.indptr[f]:columns.indptr[f + 1]]
+                step = -(-len(column) // MAX_LIKERS)
+                likers.append(column[::step])
+                liker_weights.append(np.full(len(likers[-1]), weight[f] * step, dtype=np.float32))
+            likers, liker_weights = np.concatenate(likers), np.concatenate(liker_weights)
+            if self.changed:
+                keep = ~np.isin(likers, np.fromiter(self.changed.keys(), dtype=np.int64, count=len(self.changed)))
+                likers, liker_weights = likers[keep], liker_weights[keep]
+            users, inverse = np.unique(likers, return_inverse=True)
+            user_weights = np.bincount(inverse, weights=liker_weights).astype(np.float32)
+
+            totals = np.zeros(len(popularity), dtype=np.float32)
+            if len(users):
+                base = self.rows[users].T @ user_weights
+                totals[:len(base)] += base
+            # Users changed since the build count with their latest favorites
+            for row_favorites in self.changed.values():
+                if len(row_favorites):
+                    overlap = weight[row_favorites].sum()
+                    if overlap:
+                        totals[row_favorites] += overlap
+
+            totals[favorites] = 0.0
+            candidates = np.flatnonzero(totals > 0)
+            result = totals[candidates] / np.sqrt(popularity[candidates])
+            if len(candidates) > limit:
+                top = np.argpartition(result, -limit)[-limit:]
+                candidates, result = candidates[top], result[top]
+            book_ids = self.book_ids
+            return {book_ids[c]: float(score) for c, score in zip(candidates, result)}
+
+
+def build_model(users) -> 'CoFavoriteModel':
+    return CoFavoriteModel((user.id, user.favorites) for user in users)
@@ -0,0 +1,157 @@
+import logging
+from array import array
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple
+
+from app.services.text_processing import tokenize
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Match weight per field for ranking
+FIELDS = (('judul', 1.0), ('penulis', 1.0), ('tag', 0.7))
+# Fields counted in the title/author score; tag matches only affect ranking
+TITLE_FIELDS = ('judul', 'penulis')
+# Minimum trigram similarity before a word is checked with edit distance
+MIN_JACCARD = 0.3
+# Closest variants used per query word
+MAX_VARIANTS = 5
+# Query words shorter than this only match exactly
+MIN_FUZZY_LENGTH = 4
+
+
+def trigrams(word: str) -> List[str]:
+    padded = f' {word} '
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def max_edits(word: str) -> int:
+    """Typos tolerated: one for short words, two for long ones"""
+    return 1 if len(word) <= 5 else 2
+
+
+def bounded_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, or ``limit + 1`` as soon as it must exceed ``limit``"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class TrigramIndex:
+    """Character trigram index over the words of book titles, authors and tags.
+
+    Query words missing from the vocabulary are matched to words sharing
+    trigrams (Jaccard) and confirmed with a bounded edit distance, so
+    "algoritme" finds "algoritma" and "akutansi" finds "akuntansi" without
+    calling Gemini.  A book scores the mean best match of each query word
+    (0 to 1).  A second score counts only TITLE_FIELDS and decides whether
+    the query names a specific title or author.
+    """
+
+    def __init__(self, books: Sequence):
+        self.books = tuple(books)
+        self.words: List[str] = []
+        vocabulary: Dict[str, int] = {}
+        # Per word: book ordinal -> best field weight it appears in, over all
+        # fields and over TITLE_FIELDS only
+        postings: List[Dict[int, float]] = []
+        title_postings: List[Dict[int, float]] = []
+        title_lengths = []
+        for ordinal, book in enumerate(self.books):
+            fields = (book.judul or '', book.penulis or '', ' '.join(book.tag))
+            for field, ((name, weight), text) in enumerate(zip(FIELDS, fields)):
+                tokens = tokenize(text)
+                if field == 0:
+                    title_lengths.append(len(tokens))
+                title_field = name in TITLE_FIELDS
+                for token in tokens:
+                    word_id = vocabulary.get(token)
+                    if word_id is None:
+                        word_id = vocabulary[token] = len(self.words)
+                        self.words.append(token)
+                        postings.append({})
+                        title_postings.append({})
+                    if weight > postings[word_id].get(ordinal, 0.0):
+                        postings[word_id][ordinal] = weight
+                    if title_field and weight > title_postings[word_id].get(ordinal, 0.0):
+                        title_postings[word_id][ordinal] = weight
+
+        self.vocabulary = vocabulary
+        self.postings = []
+        for entries, title_entries in zip(postings, title_postings):
+            self.postings.append((np.fromiter(entries.keys(), dtype=np.int32, count=len(entries)),
+                                  np.fromiter(entries.values(), dtype=np.float32, count=len(entries)),
+                                  np.fromiter((title_entries.get(ordinal, 0.0) for ordinal in entries),
+                                              dtype=np.float32, count=len(entries))))
+        # Title word counts, so shorter titles win ties
+        self.title_lengths = np.array(title_lengths, dtype=np.int32)
+        grams: Dict[str, array] = {}
+        for word_id, word in enumerate(self.words):
+            for gram in set(trigrams(word)):
+                grams.setdefault(gram, array('I')).append(word_id)
+        self.trigrams = grams
+        logging.info(f"Built trigram index: {len(self.books)} books, {len(self.words)} words")
+
+    def variants(self, token: str) -> List[Tuple[int, float]]:
+        """(word id, similarity) of the vocabulary words closest to ``token``"""
+        word_id = self.vocabulary.get(token)
+        if word_id is not None:
+            return [(word_id, 1.0)]
+        if len(token) < MIN_FUZZY_LENGTH:
+            return []
+
+        grams = set(trigrams(token))
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.trigrams.get(gram, ()))
+        limit = max_edits(token)
+        found = []
+        for word_id, count in shared.items():
+            word = self.words[word_id]
+            if abs(len(word) - len(token)) > limit:
+                continue
+            if count / (len(grams) + len(word) + 2 - count) < MIN_JACCARD:
+                continue
+            distance = bounded_distance(token, word, limit)
+            if distance <= limit:
+                found.append((word_id, 1.0 - distance / max(len(token), len(word))))
+        found.sort(key=lambda item: -item[1])
+        return found[:MAX_VARIANTS]
+
+    def search(self, query: str, limit: int) -> List[Tuple[int, float, float]]:
+        """(ordinal, score, title/author score) of the best typo-tolerant matches, best first"""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens or limit <= 0 or not self.books:
+            return []
+        totals = np.zeros(len(self.books), dtype=np.float32)
+        title_totals = np.zeros(len(self.books), dtype=np.float32)
+        for token in tokens:
+            best = np.zeros(len(self.books), dtype=np.float32)
+            best_title = np.zeros(len(self.books), dtype=np.float32)
+            for word_id, similarity in self.variants(token):
+                ordinals, weights, title_weights = self.postings[word_id]
+                # Ordinals are unique within a posting, so fancy indexing is safe
+                best[ordinals] = np.maximum(best[ordinals], weights * similarity)
+                best_title[ordinals] = np.maximum(best_title[ordinals], title_weights * similarity)
+            totals += best
+            title_totals += best_title
+
+        candidates = np.flatnonzero(totals)
+        if len(candidates) > limit:
+            # Keep everything tied with the ``limit``-th score so shorter titles can win
+            cutoff = np.partition(totals[candidates], -limit)[-limit]
+            candidates = candidates[totals[candidates] >= cutoff]
+        order = np.lexsort((self.title_lengths[candidates], -totals[candidates]))[:limit]
+        return [(int(ordinal), float(totals[ordinal]) / len(tokens), float(title_totals[ordinal]) / len(tokens))
+                for ordinal in candidates[order]]
@@ -1,11 +1,18 @@
 
+import asyncio
 import json
 import logging
 import os
+import re
+import threading
+import time
+import weakref
 from typing import List, Dict, Any, Tuple, Optional
 from io import BytesIO
 from PIL import Image
 
+from app.services import async_bridge
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
@@ -17,6 +24,93 @@ except ImportError:
     GENAI_AVAILABLE = False
     logging.warning("Google GenAI not available")
 
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+# Lama koneksi HTTP menganggur tetap dibuka (detik); bawaan httpx hanya 5 detik,
+# terlalu singkat untuk panggilan AI yang jaraknya bisa beberapa puluh detik
+KEEPALIVE_SECONDS = float(os.environ.get('GEMINI_KEEPALIVE_SECONDS', 120))
+# Koneksi paralel maksimum per worker, dipakai bersama oleh semua thread
+MAX_CONNECTIONS = int(os.environ.get('GEMINI_MAX_CONNECTIONS', 20))
+# Batas waktu bawaan satu panggilan lewat AsyncGeminiService (detik)
+DEADLINE_SECONDS = float(os.environ.get('GEMINI_DEADLINE_SECONDS', 30))
+# Skor relevansi minimum agar buku rekomendasi Gemini ditampilkan
+MIN_RELEVANCE = 0.6
+
+
+class ClientMetrics:
+    """
+    Penghitung per proses untuk client Gemini: berapa kali client dibuat atau
+    dipakai ulang, jumlah dan durasi panggilan, serta koneksi HTTP yang dibuka
+    baru versus dipakai ulang dari pool.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Stream jaringan yang pernah terlihat; hilang sendiri saat koneksi ditutup
+        self._streams = weakref.WeakSet()
+        self.builds = 0
+        self.client_reuses = 0
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.call_seconds = 0.0
+        self.connections_opened = 0
+        self.connections_reused = 0
+        self.warmup_seconds = None
+
+    def on_response(self, response):
+        """
+        Event hook httpx: respons lewat stream yang sudah dikenal berarti koneksinya dipakai ulang
+        """
+        stream = response.extensions.get('network_stream')
+        if stream is None:
+            return
+        with self._lock:
+            try:
+                if stream in self._streams:
+                    self.connections_reused += 1
+                else:
+                    self._streams.add(stream)
+                    self.connections_opened += 1
+            except TypeError:
+                pass
+
+    async def on_async_response(self, response):
+        """
+        Versi ``on_response`` untuk httpx.AsyncClient, yang hanya menerima hook coroutine
+        """
+        self.on_response(response)
+
+    def record_call(self, seconds: float, failed: bool = False, timed_out: bool = False):
+        with self._lock:
+            self.calls += 1
+            self.errors += failed
+            self.timeouts += timed_out
+            self.call_seconds += seconds
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'builds': self.builds,
+                'client_reuses': self.client_reuses,
+                'calls': self.calls,
+                'errors': self.errors,
+                'timeouts': self.timeouts,
+                'avg_call_ms': round(1000 * self.call_seconds / self.calls, 1) if self.calls else None,
+                'connections_opened': self.connections_opened,
+                'connections_reused': self.connections_reused,
+                'warmup_ms': round(1000 * self.warmup_seconds, 1) if self.warmup_seconds is not None else None,
+            }
+
+
+metrics = ClientMetrics()
+
+
 class GeminiBookRecommendationService:
     def __init__(self):
         if not GENAI_AVAILABLE:
@@ -28,153 +122,302 @@ class GeminiBookRecommendationService:
             raise ValueError("GEMINI_API_KEY environment variable is required")
         
         try:
-            self.client = genai.Client(api_key=api_key)
+            http_options = None
+            if HTTPX_AVAILABLE:
+                # Pool koneksi httpx aman dipakai bersama antar thread
+                limits = httpx.Limits(max_connections=MAX_CONNECTIONS,
+                                      max_keepalive_connections=MAX_CONNECTIONS,
+                                      keepalive_expiry=KEEPALIVE_SECONDS)
+                http_options = types.HttpOptions(client_args={
+                    'limits': limits,
+                    'event_hooks': {'response': [metrics.on_response]},
+                }, async_client_args={
+                    'limits': limits,
+                    'event_hooks': {'response': [metrics.on_async_response]},
+                })
+            self.client = genai.Client(api_key=api_key, http_options=http_options)
             self.model = "gemini-2.0-flash-exp"  # Use experimental model
             logging.info("Gemini client initialized successfully")
         except Exception as e:
             logging.error(f"Failed to initialize Gemini client: {str(e)}")
             raise ValueError(f"Failed to initialize Gemini client: {str(e)}")
+
+    def _generate(self, **kwargs):
+        """
+        generate_content dengan model layanan ini, dicatat di ``metrics``
+        """
+        started = time.perf_counter()
+        try:
+            response = self.client.models.generate_content(model=self.model, **kwargs)
+        except Exception:
+            metrics.record_call(time.perf_counter() - started, failed=True)
+            raise
+        metrics.record_call(time.perf_counter() - started)
+        return response
+
+    def ping(self):
+        """
+        Permintaan ringan (info model) untuk membuka koneksi TLS ke Gemini lebih awal
+        """
+        started = time.perf_counter()
+        try:
+            self.client.models.get(model=self.model)
+            metrics.warmup_seconds = time.perf_counter() - started
+        except Exception as e:
+            logging.warning(f"Gemini warm-up request failed: {str(e)}")
     
+    def close(self):
+        """
+        Tutup pool koneksi sinkron client ini
+        """
+        try:
+            if hasattr(self.client, 'close'):
+                self.client.close()
+                return
+            http_client = getattr(getattr(self.client, '_api_client', None), '_httpx_client', None)
+            if http_client is not None:
+                http_client.close()
+        except Exception as e:
+            logging.warning(f"Closing Gemini client failed: {str(e)}")
+
+    async def aclose(self):
+        """
+        Tutup pool koneksi async client ini; jalankan di loop ``async_bridge``
+        """
+        try:
+            if hasattr(self.client.aio, 'aclose'):
+                await self.client.aio.aclose()
+                return
+            api_client = getattr(self.client, '_api_client', None)
+            http_client = getattr(api_client, '_async_httpx_client', None)
+            if http_client is not None:
+                await http_client.aclose()
+            session = getattr(api_client, '_aiohttp_session', None)
+            if session is not None and not session.closed:
+                await session.close()
+        except Exception as e:
+            logging.warning(f"Closing Gemini async client failed: {str(e)}")
+
+    def _recommendations_request(self, user_query: str, available_books: List[Dict]) -> Dict[str, Any]:
+        """
+        Argumen generate_content untuk ``get_book_recommendations``
+        """
+        # Format daftar buku yang tersedia
+        books_list = self._format_books_for_prompt(available_books)
+
+        # Buat prompt yang lebih detail untuk Gemini
+        prompt = f"""
+        Kamu adalah asisten ahli rekomendasi buku yang sangat pintar dalam menganalisis kebutuhan pembaca.
+
+        PERTANYAAN PENGGUNA: "{user_query}"
+
+        DAFTAR BUKU YANG TERSEDIA:
+        {books_list}
+
+        INSTRUKSI ANALISIS:
+        1. Analisis pertanyaan pengguna dengan cermat untuk memahami:
+           - Genre yang diinginkan (romance, thriller, motivasi, dll)
+           - Mood atau suasana hati (ringan, serius, menghibur, dll)
+           - Target pembaca (anak muda, dewasa, remaja, dll)
+           - Tema spesifik (petualangan, cinta, bisnis, self-improvement, dll)
+
+        2. Untuk setiap buku, cocokkan dengan pertanyaan berdasarkan:
+           - JUDUL: Apakah judul mencerminkan tema yang dicari?
+           - TAG/GENRE: Apakah genre sesuai dengan yang diminta?
+           - DESKRIPSI: Apakah deskripsi menjelaskan konten yang relevan?
+
+        3. Berikan skor relevansi 0.0-1.0 berdasarkan seberapa cocok buku dengan pertanyaan
+
+        4. Pilih 3-6 buku dengan skor tertinggi (minimal 0.6)
+
+        CONTOH PENALARAN:
+        - Jika user cari "buku motivasi untuk anak muda" → cari tag "Motivasi", "Self-Help" dan deskripsi yang menyebutkan "inspirasi", "semangat", dll
+        - Jika user cari "novel romance ringan" → cari tag "Romance", "Fiction" dan deskripsi yang tidak terlalu drama/berat
+        - Jika user cari "buku tentang algoritma" → cari judul/deskripsi yang menyebutkan "algoritma", "programming", "komputer"
+
+        WAJIB BERIKAN RESPONS DALAM FORMAT JSON INI:
+        {{
+            "recommended_books": [
+                {{
+                    "id": "book_id",
+                    "relevance_score": 0.95,
+                    "reason": "Penjelasan detail mengapa buku ini cocok berdasarkan judul/tag/deskripsi yang sesuai dengan permintaan user"
+                }}
+            ],
+            "explanation": "Penjelasan umum tentang kriteria pencarian dan mengapa rekomendasi ini dipilih"
+        }}
+
+        PENTING: Hanya rekomendasikan buku yang benar-benar relevan dengan pertanyaan. Jangan memaksa merekomendasikan jika tidak ada yang cocok.
+        """
+        return dict(
+            contents=prompt,
+            config=types.GenerateContentConfig(
+                response_mime_type="application/json",
+                temperature=0.3  # Lower temperature for more consistent results
+            )
+        )
+
+    def _parse_recommendations(self, response) -> Dict[str, Any]:
+        return self._parse_recommendations_text(response.text)
+
+    def _parse_recommendations_text(self, text: Optional[str]) -> Dict[str, Any]:
+        if text:
+            result = json.loads(text)
+            # Filter books with relevance score >= MIN_RELEVANCE
+            if 'recommended_books' in result:
+                filtered_books = [
+                    book for book in result['recommended_books'] 
+                    if book.get('relevance_score', 0) >= MIN_RELEVANCE
+                ]
+                result['recommended_books'] = filtered_books
+            return result
+        else:
+            return {"error": "Tidak ada respons dari AI"}
+
     def get_book_recommendations(self, user_query: str, available_books: List[Dict]) -> Dict[str, Any]:
         """
         Menggunakan Gemini untuk memberikan rekomendasi buku berdasarkan pertanyaan pengguna
         """
         try:
-            # Format daftar buku yang tersedia
-            books_list = self._format_books_for_prompt(available_books)
-            
-            # Buat prompt yang lebih detail untuk Gemini
-            prompt = f"""
-            Kamu adalah asisten ahli rekomendasi buku yang sangat pintar dalam menganalisis kebutuhan pembaca.
-
-            PERTANYAAN PENGGUNA: "{user_query}"
-
-            DAFTAR BUKU YANG TERSEDIA:
-            {books_list}
-
-            INSTRUKSI ANALISIS:
-            1. Analisis pertanyaan pengguna dengan cermat untuk memahami:
-               - Genre yang diinginkan (romance, thriller, motivasi, dll)
-               - Mood atau suasana hati (ringan, serius, menghibur, dll)
-               - Target pembaca (anak muda, dewasa, remaja, dll)
-               - Tema spesifik (petualangan, cinta, bisnis, self-improvement, dll)
-               
-            2. Untuk setiap buku, cocokkan dengan pertanyaan berdasarkan:
-               - JUDUL: Apakah judul mencerminkan tema yang dicari?
-               - TAG/GENRE: Apakah genre sesuai dengan yang diminta?
-               - DESKRIPSI: Apakah deskripsi menjelaskan konten yang relevan?
-               
-            3. Berikan skor relevansi 0.0-1.0 berdasarkan seberapa cocok buku dengan pertanyaan
-            
-            4. Pilih 3-6 buku dengan skor tertinggi (minimal 0.6)
-
-            CONTOH PENALARAN:
-            - Jika user cari "buku motivasi untuk anak muda" → cari tag "Motivasi", "Self-Help" dan deskripsi yang menyebutkan "inspirasi", "semangat", dll
-            - Jika user cari "novel romance ringan" → cari tag "Romance", "Fiction" dan deskripsi yang tidak terlalu drama/berat
-            - Jika user cari "buku tentang algoritma" → cari judul/deskripsi yang menyebutkan "algoritma", "programming", "komputer"
-
-            WAJIB BERIKAN RESPONS DALAM FORMAT JSON INI:
-            {{
-                "recommended_books": [
-                    {{
-                        "id": "book_id",
-                        "relevance_score": 0.95,
-                        "reason": "Penjelasan detail mengapa buku ini cocok berdasarkan judul/tag/deskripsi yang sesuai dengan permintaan user"
-                    }}
-                ],
-                "explanation": "Penjelasan umum tentang kriteria pencarian dan mengapa rekomendasi ini dipilih"
-            }}
-            
-            PENTING: Hanya rekomendasikan buku yang benar-benar relevan dengan pertanyaan. Jangan memaksa merekomendasikan jika tidak ada yang cocok.
-            """
-            
-            response = self.client.models.generate_content(
-                model=self.model,
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json",
-                    temperature=0.3  # Lower temperature for more consistent results
-                )
-            )
-            
-            if response.text:
-                result = json.loads(response.text)
-                # Filter books with relevance score >= 0.6
-                if 'recommended_books' in result:
-                    filtered_books = [
-                        book for book in result['recommended_books'] 
-                        if book.get('relevance_score', 0) >= 0.6
-                    ]
-                    result['recommended_books'] = filtered_books
-                return result
-            else:
-                return {"error": "Tidak ada respons dari AI"}
-                
+            response = self._generate(**self._recommendations_request(user_query, available_books))
+            return self._parse_recommendations(response)
         except Exception as e:
             logging.error(f"Error in Gemini recommendation: {str(e)}")
             return {"error": "Layanan AI rekomendasi sedang tidak tersedia. Silakan coba lagi nanti."}
     
+    def _similar_books_request(self, target_book: Dict, available_books: List[Dict], limit: int = 4) -> Dict[str, Any]:
+        """
+        Argumen generate_content untuk ``find_similar_books``
+        """
+        # Format buku target dan daftar buku
+        target_info = f"""
+        BUKU TARGET:
+        - Judul: {target_book.get('judul', '')}
+        - Penulis: {target_book.get('penulis', '')}
+        - Tag/Genre: {target_book.get('tag', [])}
+        - Deskripsi: {target_book.get('deskripsi_singkat', '')}
+        """
+
+        books_list = self._format_books_for_prompt([book for book in available_books if book.get('id') != target_book.get('id')])
+
+        prompt = f"""
+        {target_info}
+
+        DAFTAR BUKU YANG TERSEDIA:
+        {books_list}
+
+        INSTRUKSI:
+        Cari {limit} buku yang paling mirip dengan buku target berdasarkan:
+        1. GENRE/TAG yang sama atau serupa
+        2. TEMA yang mirip dari deskripsi
+        3. GAYA atau SUASANA cerita yang sejenis
+
+        Berikan skor kemiripan 0.0-1.0 dan alasan yang jelas.
+
+        FORMAT RESPONS JSON:
+        {{
+            "similar_books": [
+                {{
+                    "id": "book_id",
+                    "similarity_score": 0.85,
+                    "reason": "Alasan kemiripan berdasarkan genre/tema/gaya"
+                }}
+            ]
+        }}
+        """
+        return dict(
+            contents=prompt,
+            config=types.GenerateContentConfig(
+                response_mime_type="application/json",
+                temperature=0.3
+            )
+        )
+
+    def _parse_similar_books(self, response) -> List[Dict]:
+        if response.text:
+            result = json.loads(response.text)
+            return result.get("similar_books", [])
+        else:
+            return []
+
     def find_similar_books(self, target_book: Dict, available_books: List[Dict], limit: int = 4) -> List[Dict]:
         """
         Mencari buku-buku yang mirip dengan buku target menggunakan Gemini
         """
         try:
-            # Format buku target dan daftar buku
-            target_info = f"""
-            BUKU TARGET:
-            - Judul: {target_book.get('judul', '')}
-            - Penulis: {target_book.get('penulis', '')}
-            - Tag/Genre: {target_book.get('tag', [])}
-            - Deskripsi: {target_book.get('deskripsi_singkat', '')}
-            """
-            
-            books_list = self._format_books_for_prompt([book for book in available_books if book.get('id') != target_book.get('id')])
-            
-            prompt = f"""
-            {target_info}
-            
-            DAFTAR BUKU YANG TERSEDIA:
-            {books_list}
-            
-            INSTRUKSI:
-            Cari {limit} buku yang paling mirip dengan buku target berdasarkan:
-            1. GENRE/TAG yang sama atau serupa
-            2. TEMA yang mirip dari deskripsi
-            3. GAYA atau SUASANA cerita yang sejenis
-            
-            Berikan skor kemiripan 0.0-1.0 dan alasan yang jelas.
-            
-            FORMAT RESPONS JSON:
-            {{
-                "similar_books": [
-                    {{
-                        "id": "book_id",
-                        "similarity_score": 0.85,
-                        "reason": "Alasan kemiripan berdasarkan genre/tema/gaya"
-                    }}
-                ]
-            }}
-            """
-            
-            response = self.client.models.generate_content(
-                model=self.model,
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json",
-                    temperature=0.3
-                )
-            )
-            
-            if response.text:
-                result = json.loads(response.text)
-                return result.get("similar_books", [])
-            else:
-                return []
-                
+            response = self._generate(**self._similar_books_request(target_book, available_books, limit))
+            return self._parse_similar_books(response)
         except Exception as e:
             logging.error(f"Error finding similar books: {str(e)}")
             return []
     
+    def _book_region_request(self, image_data: bytes, mime_type: str = "image/jpeg") -> Dict[str, Any]:
+        """
+        Argumen generate_content untuk ``detect_book_region``
+        """
+        import base64
+
+        # Encode image to base64
+        image_base64 = base64.b64encode(image_data).decode('utf-8')
+
+        # Buat prompt untuk mendeteksi buku
+        prompt = """
+        Analisis gambar ini dan deteksi area cover buku.
+
+        INSTRUKSI:
+        1. Identifikasi lokasi cover buku dalam gambar
+        2. Tentukan bounding box (kotak pembatas) untuk cover buku
+        3. Berikan koordinat dalam PERSENTASE (0-100) dari ukuran gambar
+
+        Format koordinat:
+        - x: posisi kiri bounding box dari kiri gambar (%)
+        - y: posisi atas bounding box dari atas gambar (%)
+        - width: lebar bounding box (%)
+        - height: tinggi bounding box (%)
+
+        Contoh: Jika buku di tengah gambar mengambil 60% lebar dan 80% tinggi:
+        {"x": 20, "y": 10, "width": 60, "height": 80}
+
+        WAJIB BERIKAN RESPONS DALAM FORMAT JSON:
+        {
+            "found": true/false,
+            "x": 0-100,
+            "y": 0-100,
+            "width": 0-100,
+            "height": 0-100,
+            "confidence": 0.0-1.0
+        }
+
+        Jika tidak ada buku yang terdeteksi, set "found": false
+        """
+        return dict(
+            contents=[
+                types.Part.from_text(text=prompt),
+                types.Part.from_bytes(
+                    data=image_data,
+                    mime_type=mime_type
+                )
+            ],
+            config=types.GenerateContentConfig(
+                response_mime_type="application/json",
+                temperature=0.1
+            )
+        )
+
+    def _parse_book_region(self, response) -> Optional[Tuple[int, int, int, int]]:
+        if response.text:
+            result = json.loads(response.text)
+
+            if result.get('found') and result.get('confidence', 0) > 0.5:
+                return (
+                    int(result['x']),
+                    int(result['y']),
+                    int(result['width']),
+                    int(result['height'])
+                )
+
+        return None
+
     def detect_book_region(self, image_data: bytes, mime_type: str = "image/jpeg") -> Optional[Tuple[int, int, int, int]]:
         """
         Mendeteksi area/region buku dalam gambar menggunakan Gemini Vision
@@ -187,70 +430,8 @@ class GeminiBookRecommendationService:
             Tuple (x, y, width, height) dalam persentase (0-100), atau None jika gagal
         """
         try:
-            import base64
-            
-            # Encode image to base64
-            image_base64 = base64.b64encode(image_data).decode('utf-8')
-            
-            # Buat prompt untuk mendeteksi buku
-            prompt = """
-            Analisis gambar ini dan deteksi area cover buku.
-            
-            INSTRUKSI:
-            1. Identifikasi lokasi cover buku dalam gambar
-            2. Tentukan bounding box (kotak pembatas) untuk cover buku
-            3. Berikan koordinat dalam PERSENTASE (0-100) dari ukuran gambar
-            
-            Format koordinat:
-            - x: posisi kiri bounding box dari kiri gambar (%)
-            - y: posisi atas bounding box dari atas gambar (%)
-            - width: lebar bounding box (%)
-            - height: tinggi bounding box (%)
-            
-            Contoh: Jika buku di tengah gambar mengambil 60% lebar dan 80% tinggi:
-            {"x": 20, "y": 10, "width": 60, "height": 80}
-            
-            WAJIB BERIKAN RESPONS DALAM FORMAT JSON:
-            {
-                "found": true/false,
-                "x": 0-100,
-                "y": 0-100,
-                "width": 0-100,
-                "height": 0-100,
-                "confidence": 0.0-1.0
-            }
-            
-            Jika tidak ada buku yang terdeteksi, set "found": false
-            """
-            
-            response = self.client.models.generate_content(
-                model=self.model,
-                contents=[
-                    types.Part.from_text(text=prompt),
-                    types.Part.from_bytes(
-                        data=image_data,
-                        mime_type=mime_type
-                    )
-                ],
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json",
-                    temperature=0.1
-                )
-            )
-            
-            if response.text:
-                result = json.loads(response.text)
-                
-                if result.get('found') and result.get('confidence', 0) > 0.5:
-                    return (
-                        int(result['x']),
-                        int(result['y']),
-                        int(result['width']),
-                        int(result['height'])
-                    )
-            
-            return None
-                
+            response = self._generate(**self._book_region_request(image_data, mime_type))
+            return self._parse_book_region(response)
         except Exception as e:
             logging.error(f"Error detecting book region: {str(e)}")
             return None
@@ -313,6 +494,135 @@ class GeminiBookRecommendationService:
             # Return original jika gagal
             return image_data, mime_type
     
+    def _book_info_request(self, image_data: bytes, mime_type: str = "image/jpeg") -> Dict[str, Any]:
+        """
+        Argumen generate_content untuk ``extract_book_info_from_image``
+        """
+        import base64
+
+        # Encode image to base64
+        image_base64 = base64.b64encode(image_data).decode('utf-8')
+
+        # Buat prompt untuk Gemini Vision
+        # Daftar tag yang tersedia
+        available_tags = [
+            'Algoritma', 'Struktur Data', 'Pemrograman', 'Basis Data',
+            'Kecerdasan Buatan', 'Pembelajaran Mesin', 'Sistem Operasi',
+            'Jaringan Komputer', 'Keamanan Informatika', 'Komputasi Awan',
+            'Data Science', 'Sistem Tertanam', 'Rekayasa Perangkat Lunak',
+            'Manajemen Proyek', 'Manajemen Sumber Daya Manusia', 'Akuntansi',
+            'Keuangan', 'Analisis Bisnis', 'Bisnis Digital', 'Pemasaran',
+            'Ekonomi Mikro/Makro', 'Perilaku Organisasi', 'Audit Internal',
+            'Teknik Lingkungan', 'Teknik Pertambangan', 'Teknik Elektro',
+            'Teknik Mesin', 'Sistem Proses', 'Kontrol Otomatis', 'Robotika',
+            'Arsitektur Komputer', 'Sistem Terdistribusi', 'Komputasi Paralel',
+            'Pemrograman Web', 'Pemrograman Mobile', 'Internet of Things (IoT)',
+            'Cloud Native', 'Containerization', 'Microservices', 'API Development',
+            'Testing & QA', 'Code Review', 'Version Control', 'Dokumentasi Teknis',
+            'Manajemen Database', 'Data Warehousing', 'Business Intelligence',
+            'Visualisasi Data', 'Statistika Terapan', 'Riset Operasi', 'Optimasi',
+            'Simulasi Sistem', 'Pemodelan Matematika', 'Kriptografi', 'Forensik Digital',
+            'Etika Teknologi', 'Hukum Siber', 'Manajemen Risiko TI', 'Tata Kelola TI',
+            'Audit Sistem'
+        ]
+
+        tags_list = ', '.join(available_tags)
+
+        prompt = f"""
+        Analisis gambar buku ini dengan sangat teliti dan ekstrak informasi berikut:
+
+        INSTRUKSI:
+        1. Baca dan identifikasi JUDUL BUKU dengan akurat (perhatikan huruf besar/kecil)
+        2. Identifikasi NAMA PENULIS dengan lengkap
+        3. Pilih 2-4 TAG yang PALING SESUAI dari daftar berikut:
+           {tags_list}
+
+           Pilih tag berdasarkan:
+           - Topik utama buku yang terlihat dari judul dan cover
+           - Kategori/bidang ilmu yang paling relevan
+           - HANYA gunakan tag dari daftar di atas, JANGAN buat tag baru
+           - Pilih tag yang paling spesifik dan sesuai
+
+        4. Buat DESKRIPSI LENGKAP (MINIMAL 3500 KARAKTER) yang FOKUS pada topik utama buku:
+
+           - Jelaskan apa topik utama buku ini secara detail
+           - Apa saja yang dibahas dalam buku (konsep, metode, pembahasan)
+           - Siapa target pembaca yang cocok (level, latar belakang)
+           - Apa manfaat atau skill yang didapat setelah membaca
+           - Bagaimana buku ini bisa diterapkan dalam praktik
+
+        PENTING:
+        - Jika ada teks dalam bahasa Indonesia, pertahankan bahasa Indonesia
+        - Jika teks dalam bahasa Inggris, pertahankan bahasa Inggris
+        - Pastikan judul dan penulis PERSIS seperti yang tertulis di buku
+        - Tag HARUS dipilih dari daftar yang tersedia, jangan buat tag baru
+        - Deskripsi HARUS MINIMAL 3500 KARAKTER (bukan kata), lebih panjang lebih baik
+        - Fokus pada TOPIK UTAMA buku, bukan hal-hal umum
+        - Gunakan bahasa yang informatif, profesional, dan menarik
+        - Jelaskan secara DETAIL dan RELEVAN dengan isi buku
+        - Hindari kalimat yang terlalu umum atau klise
+        - Buat deskripsi dalam 1-2 paragraf yang padat informasi
+
+        WAJIB BERIKAN RESPONS DALAM FORMAT JSON INI:
+        {{
+            "judul": "Judul Buku Lengkap",
+            "penulis": "Nama Penulis Lengkap",
+            "tag": ["Tag1", "Tag2", "Tag3"],
+            "deskripsi_singkat": "Deskripsi singkat yang informatif tentang buku ini..."
+        }}
+
+        Jika gambar tidak jelas atau tidak bisa dibaca, berikan respons dengan field "error".
+        """
+        return dict(
+            contents=[
+                types.Part.from_text(text=prompt),
+                types.Part.from_bytes(
+                    data=image_data,
+                    mime_type=mime_type
+                )
+            ],
+            config=types.GenerateContentConfig(
+                response_mime_type="application/json",
+                temperature=0.2  # Lower temperature for more accurate extraction
+            )
+        )
+
+    def _parse_book_info(self, response) -> Dict[str, Any]:
+        if response.text:
+            try:
+                result = json.loads(response.text)
+            except json.JSONDecodeError as e:
+                logging.error(f"Failed to parse Gemini JSON response: {str(e)}")
+                return {"error": "AI memberikan respons yang tidak valid. Silakan coba lagi."}
+
+            # Validate the result
+            if 'error' in result:
+                return {"error": result.get('error', 'Tidak dapat membaca informasi dari gambar')}
+
+            # Ensure all required fields are present
+            required_fields = ['judul', 'penulis', 'tag', 'deskripsi_singkat']
+            for field in required_fields:
+                if field not in result or not result[field]:
+                    return {"error": f"Informasi {field} tidak dapat diekstrak dari gambar"}
+
+            # Ensure tag is a list
+            if isinstance(result['tag'], str):
+                result['tag'] = [result['tag']]
+
+            # Convert all-caps title to title case
+            if result.get('judul'):
+                judul = result['judul']
+                # Check if the title is all uppercase (with tolerance for spaces and punctuation)
+                words = judul.split()
+                if all(word.isupper() or not word.isalpha() for word in words):
+                    # Convert to title case
+                    result['judul'] = judul.title()
+
+            logging.info(f"Successfully extracted book info: {result.get('judul', 'Unknown')}")
+            return result
+        else:
+            return {"error": "Tidak ada respons dari AI"}
+
     def extract_book_info_from_image(self, image_data: bytes, mime_type: str = "image/jpeg") -> Dict[str, Any]:
         """
         Menggunakan Gemini Vision untuk mengekstrak informasi buku dari gambar
@@ -325,133 +635,8 @@ class GeminiBookRecommendationService:
             Dictionary dengan informasi buku yang diekstrak
         """
         try:
-            import base64
-            
-            # Encode image to base64
-            image_base64 = base64.b64encode(image_data).decode('utf-8')
-            
-            # Buat prompt untuk Gemini Vision
-            # Daftar tag yang tersedia
-            available_tags = [
-                'Algoritma', 'Struktur Data', 'Pemrograman', 'Basis Data',
-                'Kecerdasan Buatan', 'Pembelajaran Mesin', 'Sistem Operasi',
-                'Jaringan Komputer', 'Keamanan Informatika', 'Komputasi Awan',
-                'Data Science', 'Sistem Tertanam', 'Rekayasa Perangkat Lunak',
-                'Manajemen Proyek', 'Manajemen Sumber Daya Manusia', 'Akuntansi',
-                'Keuangan', 'Analisis Bisnis', 'Bisnis Digital', 'Pemasaran',
-                'Ekonomi Mikro/Makro', 'Perilaku Organisasi', 'Audit Internal',
-                'Teknik Lingkungan', 'Teknik Pertambangan', 'Teknik Elektro',
-                'Teknik Mesin', 'Sistem Proses', 'Kontrol Otomatis', 'Robotika',
-                'Arsitektur Komputer', 'Sistem Terdistribusi', 'Komputasi Paralel',
-                'Pemrograman Web', 'Pemrograman Mobile', 'Internet of Things (IoT)',
-                'Cloud Native', 'Containerization', 'Microservices', 'API Development',
-                'Testing & QA', 'Code Review', 'Version Control', 'Dokumentasi Teknis',
-                'Manajemen Database', 'Data Warehousing', 'Business Intelligence',
-                'Visualisasi Data', 'Statistika Terapan', 'Riset Operasi', 'Optimasi',
-                'Simulasi Sistem', 'Pemodelan Matematika', 'Kriptografi', 'Forensik Digital',
-                'Etika Teknologi', 'Hukum Siber', 'Manajemen Risiko TI', 'Tata Kelola TI',
-                'Audit Sistem'
-            ]
-            
-            tags_list = ', '.join(available_tags)
-            
-            prompt = f"""
-            Analisis gambar buku ini dengan sangat teliti dan ekstrak informasi berikut:
-            
-            INSTRUKSI:
-            1. Baca dan identifikasi JUDUL BUKU dengan akurat (perhatikan huruf besar/kecil)
-            2. Identifikasi NAMA PENULIS dengan lengkap
-            3. Pilih 2-4 TAG yang PALING SESUAI dari daftar berikut:
-               {tags_list}
-               
-               Pilih tag berdasarkan:
-               - Topik utama buku yang terlihat dari judul dan cover
-               - Kategori/bidang ilmu yang paling relevan
-               - HANYA gunakan tag dari daftar di atas, JANGAN buat tag baru
-               - Pilih tag yang paling spesifik dan sesuai
-               
-            4. Buat DESKRIPSI LENGKAP (MINIMAL 3500 KARAKTER) yang FOKUS pada topik utama buku:
-               
-               - Jelaskan apa topik utama buku ini secara detail
-               - Apa saja yang dibahas dalam buku (konsep, metode, pembahasan)
-               - Siapa target pembaca yang cocok (level, latar belakang)
-               - Apa manfaat atau skill yang didapat setelah membaca
-               - Bagaimana buku ini bisa diterapkan dalam praktik
-            
-            PENTING:
-            - Jika ada teks dalam bahasa Indonesia, pertahankan bahasa Indonesia
-            - Jika teks dalam bahasa Inggris, pertahankan bahasa Inggris
-            - Pastikan judul dan penulis PERSIS seperti yang tertulis di buku
-            - Tag HARUS dipilih dari daftar yang tersedia, jangan buat tag baru
-            - Deskripsi HARUS MINIMAL 3500 KARAKTER (bukan kata), lebih panjang lebih baik
-            - Fokus pada TOPIK UTAMA buku, bukan hal-hal umum
-            - Gunakan bahasa yang informatif, profesional, dan menarik
-            - Jelaskan secara DETAIL dan RELEVAN dengan isi buku
-            - Hindari kalimat yang terlalu umum atau klise
-            - Buat deskripsi dalam 1-2 paragraf yang padat informasi
-            
-            WAJIB BERIKAN RESPONS DALAM FORMAT JSON INI:
-            {{
-                "judul": "Judul Buku Lengkap",
-                "penulis": "Nama Penulis Lengkap",
-                "tag": ["Tag1", "Tag2", "Tag3"],
-                "deskripsi_singkat": "Deskripsi singkat yang informatif tentang buku ini..."
-            }}
-            
-            Jika gambar tidak jelas atau tidak bisa dibaca, berikan respons dengan field "error".
-            """
-            
-            # Call Gemini Vision API
-            response = self.client.models.generate_content(
-                model=self.model,
-                contents=[
-                    types.Part.from_text(text=prompt),
-                    types.Part.from_bytes(
-                        data=image_data,
-                        mime_type=mime_type
-                    )
-                ],
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json",
-                    temperature=0.2  # Lower temperature for more accurate extraction
-                )
-            )
-            
-            if response.text:
-                try:
-                    result = json.loads(response.text)
-                except json.JSONDecodeError as e:
-                    logging.error(f"Failed to parse Gemini JSON response: {str(e)}")
-                    return {"error": "AI memberikan respons yang tidak valid. Silakan coba lagi."}
-                
-                # Validate the result
-                if 'error' in result:
-                    return {"error": result.get('error', 'Tidak dapat membaca informasi dari gambar')}
-                
-                # Ensure all required fields are present
-                required_fields = ['judul', 'penulis', 'tag', 'deskripsi_singkat']
-                for field in required_fields:
-                    if field not in result or not result[field]:
-                        return {"error": f"Informasi {field} tidak dapat diekstrak dari gambar"}
-                
-                # Ensure tag is a list
-                if isinstance(result['tag'], str):
-                    result['tag'] = [result['tag']]
-                
-                # Convert all-caps title to title case
-                if result.get('judul'):
-                    judul = result['judul']
-                    # Check if the title is all uppercase (with tolerance for spaces and punctuation)
-                    words = judul.split()
-                    if all(word.isupper() or not word.isalpha() for word in words):
-                        # Convert to title case
-                        result['judul'] = judul.title()
-                
-                logging.info(f"Successfully extracted book info: {result.get('judul', 'Unknown')}")
-                return result
-            else:
-                return {"error": "Tidak ada respons dari AI"}
-                
+            response = self._generate(**self._book_info_request(image_data, mime_type))
+            return self._parse_book_info(response)
         except Exception as e:
             logging.error(f"Error in image analysis: {str(e)}")
             return {"error": f"Terjadi kesalahan saat menganalisis gambar: {str(e)}"}
@@ -472,3 +657,259 @@ class GeminiBookRecommendationService:
             formatted_books.append(book_info)
         
         return "\n\n".join(formatted_books)
+
+
+class RecommendationStream:
+    """
+    Pengurai bertahap untuk respons JSON rekomendasi yang datang per potongan.
+
+    ``feed`` mengembalikan setiap objek di array ``recommended_books`` begitu
+    kurung tutupnya diterima, tanpa menunggu sisa respons; objek yang belum
+    lengkap ditunggu sampai potongan berikutnya. Teks lengkapnya tetap
+    tersedia di ``text`` untuk diurai utuh setelah stream selesai.
+    """
+
+    _ARRAY_START = re.compile(r'"recommended_books"\s*:\s*\[')
+    _decoder = json.JSONDecoder()
+
+    def __init__(self):
+        self.text = ''
+        # Posisi berikutnya di dalam array; None sebelum awal array terlihat
+        self._position = None
+        self._finished = False
+
+    def feed(self, chunk: str) -> List[Dict]:
+        self.text += chunk
+        items = []
+        if self._finished:
+            return items
+        if self._position is None:
+            match = self._ARRAY_START.search(self.text)
+            if match is None:
+                return items
+            self._position = match.end()
+        while True:
+            position = self._position
+            while position < len(self.text) and self.text[position] in ' \t\r\n,':
+                position += 1
+            if position >= len(self.text):
+                break
+            if self.text[position] == ']':
+                self._finished = True
+                break
+            try:
+                item, self._position = self._decoder.raw_decode(self.text, position)
+            except json.JSONDecodeError:
+                break
+            if isinstance(item, dict):
+                items.append(item)
+        return items
+
+
+class AsyncGeminiService:
+    """
+    Varian asyncio dari GeminiBookRecommendationService.
+
+    Memakai prompt dan parser yang sama dari layanan sinkron yang
+    dibungkusnya, tetapi memanggil ``client.aio`` sehingga beberapa
+    panggilan bisa berjalan bersamaan di satu event loop. Setiap panggilan
+    dibatasi ``deadline`` detik; panggilan yang melewatinya dibatalkan dan
+    mengembalikan nilai cadangan yang sama seperti saat Gemini gagal.
+    Client async terikat ke satu event loop, jadi gunakan dari loop
+    ``async_bridge`` saja.
+    """
+
+    def __init__(self, service: GeminiBookRecommendationService, deadline: float = DEADLINE_SECONDS):
+        self.service = service
+        self.deadline = deadline
+
+    async def _generate(self, request: Dict[str, Any], deadline: Optional[float] = None):
+        """
+        generate_content async dengan batas waktu, dicatat di ``metrics``
+        """
+        started = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(
+                self.service.client.aio.models.generate_content(model=self.service.model, **request),
+                deadline or self.deadline
+            )
+        except asyncio.TimeoutError:
+            metrics.record_call(time.perf_counter() - started, failed=True, timed_out=True)
+            raise
+        except Exception:
+            metrics.record_call(time.perf_counter() - started, failed=True)
+            raise
+        metrics.record_call(time.perf_counter() - started)
+        return response
+
+    async def get_book_recommendations(self, user_query: str, available_books: List[Dict],
+                                       deadline: Optional[float] = None) -> Dict[str, Any]:
+        try:
+            request = self.service._recommendations_request(user_query, available_books)
+            return self.service._parse_recommendations(await self._generate(request, deadline))
+        except asyncio.TimeoutError:
+            logging.error("Gemini recommendation timed out")
+            return {"error": "Layanan AI rekomendasi sedang tidak tersedia. Silakan coba lagi nanti."}
+        except Exception as e:
+            logging.error(f"Error in Gemini recommendation: {str(e)}")
+            return {"error": "Layanan AI rekomendasi sedang tidak tersedia. Silakan coba lagi nanti."}
+
+    async def stream_book_recommendations(self, user_query: str, available_books: List[Dict],
+                                          deadline: Optional[float] = None):
+        """
+        Rekomendasi lewat generate_content_stream.
+
+        Menghasilkan ``('book', rekomendasi)`` untuk setiap buku yang cukup
+        relevan begitu objeknya terbaca dari stream, lalu satu
+        ``('result', hasil)`` dengan hasil lengkap seperti
+        ``get_book_recommendations``, termasuk ``{"error": ...}`` jika gagal
+        atau melewati batas waktu.
+        """
+        parser = RecommendationStream()
+        started = time.perf_counter()
+        try:
+            async with asyncio.timeout(deadline or self.deadline):
+                request = self.service._recommendations_request(user_query, available_books)
+                stream = await self.service.client.aio.models.generate_content_stream(model=self.service.model,
+                                                                                       **request)
+                async for chunk in stream:
+                    for item in parser.feed(chunk.text or ''):
+                        if item.get('relevance_score', 0) >= MIN_RELEVANCE:
+                            yield 'book', item
+            result = self.service._parse_recommendations_text(parser.text)
+        except TimeoutError:
+            metrics.record_call(time.perf_counter() - started, failed=True, timed_out=True)
+            logging.error("Gemini recommendation stream timed out")
+            yield 'result', {"error": "Layanan AI rekomendasi sedang tidak tersedia. Silakan coba lagi nanti."}
+            return
+        except Exception as e:
+            metrics.record_call(time.perf_counter() - started, failed=True)
+            logging.error(f"Error in Gemini recommendation stream: {str(e)}")
+            yield 'result', {"error": "Layanan AI rekomendasi sedang tidak tersedia. Silakan coba lagi nanti."}
+            return
+        metrics.record_call(time.perf_counter() - started)
+        yield 'result', result
+
+    async def find_similar_books(self, target_book: Dict, available_books: List[Dict], limit: int = 4,
+                                 deadline: Optional[float] = None) -> List[Dict]:
+        try:
+            request = self.service._similar_books_request(target_book, available_books, limit)
+            return self.service._parse_similar_books(await self._generate(request, deadline))
+        except asyncio.TimeoutError:
+            logging.error("Finding similar books timed out")
+            return []
+        except Exception as e:
+            logging.error(f"Error finding similar books: {str(e)}")
+            return []
+
+    async def detect_book_region(self, image_data: bytes, mime_type: str = "image/jpeg",
+                                 deadline: Optional[float] = None) -> Optional[Tuple[int, int, int, int]]:
+        try:
+            request = self.service._book_region_request(image_data, mime_type)
+            return self.service._parse_book_region(await self._generate(request, deadline))
+        except asyncio.TimeoutError:
+            logging.error("Detecting book region timed out")
+            return None
+        except Exception as e:
+            logging.error(f"Error detecting book region: {str(e)}")
+            return None
+
+    async def extract_book_info_from_image(self, image_data: bytes, mime_type: str = "image/jpeg",
+                                           deadline: Optional[float] = None) -> Dict[str, Any]:
+        try:
+            request = self.service._book_info_request(image_data, mime_type)
+            return self.service._parse_book_info(await self._generate(request, deadline))
+        except asyncio.TimeoutError:
+            logging.error("Image analysis timed out")
+            return {"error": "AI terlalu lama menganalisis gambar. Silakan coba lagi."}
+        except Exception as e:
+            logging.error(f"Error in image analysis: {str(e)}")
+            return {"error": f"Terjadi kesalahan saat menganalisis gambar: {str(e)}"}
+
+    async def analyze_cover(self, image_data: bytes, mime_type: str = "image/jpeg",
+                            deadline: Optional[float] = None) -> Tuple[Dict[str, Any], Optional[Tuple[int, int, int, int]]]:
+        """
+        Ekstraksi informasi buku dan deteksi area cover dijalankan bersamaan
+
+        Returns:
+            Tuple (informasi buku, area cover dalam persen atau None)
+        """
+        return tuple(await asyncio.gather(
+            self.extract_book_info_from_image(image_data, mime_type, deadline),
+            self.detect_book_region(image_data, mime_type, deadline)
+        ))
+
+
+_service = None
+_service_key = None
+_service_lock = threading.Lock()
+_async_service = None
+
+
+def get_service() -> GeminiBookRecommendationService:
+    """
+    Layanan Gemini bersama untuk proses ini. Client beserta pool koneksi
+    HTTP-nya dibuat sekali lalu dipakai ulang lintas request dan thread;
+    client baru hanya dibuat jika GEMINI_API_KEY berubah (lewat halaman
+    admin NLP), dan pool koneksi client lama lalu ditutup. Melempar
+    ValueError seperti konstruktornya.
+    """
+    global _service, _service_key
+    api_key = os.environ.get("GEMINI_API_KEY")
+    with _service_lock:
+        if _service is not None and api_key == _service_key:
+            metrics.client_reuses += 1
+            return _service
+        previous = _service
+        _service = GeminiBookRecommendationService()
+        _service_key = api_key
+        metrics.builds += 1
+        if previous is not None:
+            _retire(previous, _async_service is not None and _async_service.service is previous)
+        return _service
+
+
+def _retire(service: GeminiBookRecommendationService, used_async: bool):
+    """
+    Tutup pool koneksi layanan yang diganti, setelah panggilan yang masih
+    berjalan sempat selesai (``DEADLINE_SECONDS``). Client async ditutup di
+    loop ``async_bridge`` tempat koneksinya dibuka.
+    """
+    timer = threading.Timer(DEADLINE_SECONDS, service.close)
+    timer.daemon = True
+    timer.start()
+    if used_async:
+        loop = async_bridge.get_loop()
+        loop.call_soon_threadsafe(loop.call_later, DEADLINE_SECONDS,
+                                  lambda: loop.create_task(service.aclose()))
+
+
+def get_async_service() -> AsyncGeminiService:
+    """
+    Pembungkus async untuk layanan dari ``get_service``, ikut diganti saat client dibuat ulang
+    """
+    global _async_service
+    service = get_service()
+    with _service_lock:
+        if _async_service is None or _async_service.service is not service:
+            _async_service = AsyncGeminiService(service)
+        return _async_service
+
+
+def warm_up(connect: bool = True) -> Optional[GeminiBookRecommendationService]:
+    """
+    Siapkan client saat worker mulai. Dengan ``connect``, koneksi TLS dibuka
+    di thread latar agar worker tidak tertahan menunggunya.
+    """
+    try:
+        service = get_service()
+    except ValueError as e:
+        logging.info(f"Gemini warm-up skipped: {str(e)}")
+        return None
+    if connect:
+        threading.Thread(target=service.ping, name='gemini-warm-up', daemon=True).start()
+    return service
+
+
+def stats() -> Dict[str, Any]:
+    return metrics.snapshot()
@@ -0,0 +1,169 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from app.services.text_processing import normalize
+from app.storage import cache_dir
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed);
+"""
+
+_SEPARATORS = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def normalize_query(query: str) -> str:
+    """Canonical query form, so "Buku  Algoritma?" and "buku algoritma" share a key"""
+    return ' '.join(_SEPARATORS.sub(' ', normalize(query)).split())
+
+
+class NLPResponseCache:
+    """Two-level cache of Gemini recommendation answers.
+
+    An in-memory LRU per worker in front of a SQLite file (WAL mode) in
+    data/cache shared by all workers on the host.  Keys combine the
+    normalised query with ``version`` (catalog and prompt settings), so a
+    catalog change retires old entries.  Entries expire after ``ttl``
+    seconds and the file keeps at most ``max_entries``, least recently used
+    first out.
+    """
+
+    # Drop expired and excess rows from the file once every this many puts
+    EVICT_EVERY = 50
+    # Only rewrite a row's access time once it is older than this (seconds)
+    TOUCH_AFTER = 60.0
+
+    def __init__(self, path: str, ttl: float = 86400, max_entries: int = 10000, memory_size: int = 512):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory_size = memory_size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._puts = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def connect(self) -> sqlite3.Connection:
+        """Per-thread connection, reopened after fork"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(SCHEMA)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def key(query: str, version: str) -> str:
+        return hashlib.blake2b(f'{version}\x00{normalize_query(query)}'.encode('utf-8'), digest_size=16).hexdigest()
+
+    def get(self, query: str, version: str) -> Optional[Dict[str, Any]]:
+        """Stored answer for the query at ``version``, or None"""
+        key, now = self.key(query, version), time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[0] > now:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return json.loads(entry[1])
+
+        try:
+            conn = self.connect()
+            row = conn.execute('SELECT value, created, accessed FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is not None and row[1] + self.ttl > now and now - row[2] > self.TOUCH_AFTER:
+                conn.execute('UPDATE responses SET accessed = ? WHERE key = ?', (now, key))
+        except sqlite3.Error as e:
+            logging.warning(f"NLP response cache read failed: {str(e)}")
+            row = None
+            self.errors += 1
+
+        with self._lock:
+            if row is None or row[1] + self.ttl <= now:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, row[1] + self.ttl, row[0])
+        return json.loads(row[0])
+
+    def put(self, query: str, version: str, value: Dict[str, Any]):
+        key, now = self.key(query, version), time.time()
+        encoded = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._remember(key, now + self.ttl, encoded)
+            self._puts += 1
+            evict = self._puts % self.EVICT_EVERY == 0
+        try:
+            conn = self.connect()
+            conn.execute('INSERT OR REPLACE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)',
+                         (key, encoded, now, now))
+            if evict:
+                self._evict(conn, now)
+        except sqlite3.Error as e:
+            logging.warning(f"NLP response cache write failed: {str(e)}")
+            self.errors += 1
+
+    def _remember(self, key: str, expires: float, encoded: str):
+        self._memory[key] = (expires, encoded)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        conn.execute('DELETE FROM responses WHERE created <= ?', (now - self.ttl,))
+        excess = conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0] - self.max_entries
+        if excess > 0:
+            conn.execute('DELETE FROM responses WHERE key IN '
+                         '(SELECT key FROM responses ORDER BY accessed LIMIT ?)', (excess,))
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        try:
+            self.connect().execute('DELETE FROM responses')
+        except sqlite3.Error as e:
+            logging.warning(f"NLP response cache clear failed: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            entries = self.connect().execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+        except sqlite3.Error:
+            entries = None
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'memory_entries': len(self._memory),
+                'disk_entries': entries,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'errors': self.errors,
+            }
+
+
+def from_environment() -> NLPResponseCache:
+    """Cache in data/cache/nlp_responses.sqlite3 sized by NLP_CACHE_TTL, NLP_CACHE_SIZE and NLP_CACHE_MEMORY_SIZE"""
+    return NLPResponseCache(os.path.join(cache_dir(), 'nlp_responses.sqlite3'),
+                            ttl=float(os.environ.get('NLP_CACHE_TTL', 86400)),
+                            max_entries=int(os.environ.get('NLP_CACHE_SIZE', 10000)),
+                            memory_size=int(os.environ.get('NLP_CACHE_MEMORY_SIZE', 512)))
@@ -0,0 +1,99 @@
+"""Precompute every user's personal recommendations in one batch.
+
+Reads the catalog and all users once, ranks each user's candidates in a
+process pool (forked workers share the scoring matrices built here) and
+writes data/cache/recommendations.bin, which the web workers memory-map.
+Each entry records a digest of the favorites it was computed from; when
+a user's favorites change afterwards the app ranks them live instead; the
+file header records the catalog signature, so after any book is added,
+edited or deleted the whole batch is ignored until it runs again.
+It also brings data/cache/similar_books.json up to date with the catalog.
+
+Usage:
+    python -m app.services.precompute [--workers 4] [--pool 28] [--output data/cache/recommendations.bin]
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from app.models.book import Book
+from app.models.settings import Settings
+from app.models.user import User
+from app.services.recommendation_store import write_store
+from app.services.recommender import TagAffinityEngine
+from app.services.similarity import SCIPY_AVAILABLE
+from app.storage import cache_dir
+
+CHUNK_SIZE = 500
+
+
+def default_output():
+    return os.path.join(cache_dir(), 'recommendations.bin')
+
+
+def _rank_chunk(args):
+    """Worker: rank a chunk of users against the catalog inherited from the parent"""
+    user_ids, pool_size = args
+    ordinals = Book.affinity_engine().ordinals
+    results = []
+    for user_id in user_ids:
+        user = User.get(user_id)
+        if user is None or not user.favorites:
+            continue
+        ranked = Book._rank_for_user(user, pool_size)
+        results.append((user.id, list(user.favorites),
+                        [(ordinals[book.id], score) for book, score in ranked if book.id in ordinals]))
+    return results
+
+
+def precompute(output, workers=None, pool_size=None):
+    pool_size = pool_size or Settings.get_personal_recommendations_count() * TagAffinityEngine.TIE_POOL
+    started = time.perf_counter()
+
+    # Similar-book lists are also too slow to compute inside a web request
+    if SCIPY_AVAILABLE:
+        Book.similarity_index().refresh()
+
+    # Build everything the workers need before forking, so they share it instead of reloading
+    with Book.catalog().lock:
+        engine = Book.affinity_engine()
+        catalog_signature = Book.catalog().current_signature()
+    User.co_favorites()
+    user_ids = [user.id for user in User.get_all() if user.favorites]
+    chunks = [(user_ids[i:i + CHUNK_SIZE], pool_size) for i in range(0, len(user_ids), CHUNK_SIZE)]
+
+    entries = []
+    if workers == 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            entries.extend(_rank_chunk(chunk))
+    else:
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            for results in executor.map(_rank_chunk, chunks):
+                entries.extend(results)
+
+    write_store(output, [book.id for book in engine.books], pool_size, entries, catalog_signature)
+    logging.info(f"Precomputed recommendations for {len(entries)} users "
+                 f"({len(engine.books)} books) in {time.perf_counter() - started:.1f}s -> {output}")
+    return len(entries)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Precompute personal recommendations for all users')
+    parser.add_argument('--output', default=default_output())
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--pool', type=int, default=None,
+                        help='ranked candidates kept per user (default: personal count x 4)')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    precompute(args.output, workers=args.workers, pool_size=args.pool)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
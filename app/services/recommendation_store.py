@@ -0,0 +1,187 @@
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+# Batch recommendation file layout (all little-endian):
+#   header  : magic, version, user count, book count, slots per user, created time,
+#             digest of the catalog signature the batch was computed from
+#   books   : (book count + 1) uint32 offsets into a blob of book ids, then the UTF-8 blob
+#   users   : records sorted by key (16-byte id digest, 8-byte favorites digest)
+#   results : per user ``slots`` pairs (uint32 book ordinal, float32 score)
+MAGIC = b'RKBR'
+VERSION = 2
+HEADER = struct.Struct('<4sIIIId8s')
+USER_RECORD = struct.Struct('<16s8s')
+SLOT = struct.Struct('<If')
+EMPTY_SLOT = 0xFFFFFFFF
+
+
+def user_key(user_id: str) -> bytes:
+    return hashlib.blake2b(user_id.encode('utf-8'), digest_size=16).digest()
+
+
+def favorites_digest(favorites: Sequence[str]) -> bytes:
+    """Favorites fingerprint that is stable across processes, unlike hash()"""
+    return hashlib.blake2b('\x00'.join(sorted(set(favorites))).encode('utf-8'), digest_size=8).digest()
+
+
+def catalog_digest(signature) -> bytes:
+    """Fingerprint of the catalog storage signature, which changes on every book write"""
+    return hashlib.blake2b(repr(signature).encode('utf-8'), digest_size=8).digest()
+
+
+def write_store(path: str, book_ids: Sequence[str], slots: int,
+                entries: Iterable[Tuple[str, Sequence[str], Sequence[Tuple[int, float]]]],
+                catalog_signature=None):
+    """Write the batch file atomically.
+
+    ``entries`` are (user id, favorites at ranking time, [(book ordinal,
+    score), ...]); ``catalog_signature`` is the catalog they were ranked on.
+    """
+    records = sorted((user_key(user_id), favorites_digest(favorites), ranked)
+                     for user_id, favorites, ranked in entries)
+    encoded = [book_id.encode('utf-8') for book_id in book_ids]
+    offsets = [0]
+    for value in encoded:
+        offsets.append(offsets[-1] + len(value))
+
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(records), len(book_ids), slots, time.time(),
+                            catalog_digest(catalog_signature)))
+        f.write(struct.pack(f'<{len(offsets)}I', *offsets))
+        f.write(b''.join(encoded))
+        for key, digest, _ in records:
+            f.write(USER_RECORD.pack(key, digest))
+        empty = SLOT.pack(EMPTY_SLOT, 0.0)
+        for _, _, ranked in records:
+            ranked = list(ranked)[:slots]
+            f.write(b''.join(SLOT.pack(ordinal, score) for ordinal, score in ranked))
+            f.write(empty * (slots - len(ranked)))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class RecommendationStore:
+    """Memory-mapped reader of the batch file.
+
+    Users are found by binary search over the sorted records without
+    loading the file; it is reopened when the next batch replaces it.
+    """
+
+    # Seconds between checks for a replaced file
+    CHECK_INTERVAL = 5.0
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._identity = None
+        self._checked_at = 0.0
+        self._map = None
+        self.hits = 0
+        self.stale = 0
+        self.outdated = 0
+
+    def _current(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked_at < self.CHECK_INTERVAL:
+                return self._map
+            self._checked_at = now
+            try:
+                stat = os.stat(self.path)
+            except OSError:
+                self._identity, self._map = None, None
+                return None
+            identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if identity != self._identity:
+                self._identity = identity
+                self._map = self._open()
+            return self._map
+
+    def _open(self):
+        try:
+            with open(self.path, 'rb') as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Cannot open precomputed recommendations {self.path}: {str(e)}")
+            return None
+        try:
+            magic, version, users, books, slots, created, catalog = HEADER.unpack_from(data, 0)
+        except struct.error:
+            magic = version = None
+        if magic != MAGIC or version != VERSION:
+            logging.warning(f"Ignoring {self.path}: unknown format")
+            return None
+        offsets_at = HEADER.size
+        blob_at = offsets_at + 4 * (books + 1)
+        blob_size = struct.unpack_from('<I', data, offsets_at + 4 * books)[0]
+        users_at = blob_at + blob_size
+        results_at = users_at + USER_RECORD.size * users
+        logging.info(f"Loaded precomputed recommendations: {users} users, {slots} per user")
+        return {'data': data, 'users': users, 'books': books, 'slots': slots, 'created': created, 'catalog': catalog,
+                'offsets_at': offsets_at, 'blob_at': blob_at, 'users_at': users_at, 'results_at': results_at}
+
+    def _book_id(self, store, ordinal: int) -> str:
+        start, end = struct.unpack_from('<II', store['data'], store['offsets_at'] + 4 * ordinal)
+        return store['data'][store['blob_at'] + start:store['blob_at'] + end].decode('utf-8')
+
+    def lookup(self, user_id: str, favorites: Sequence[str],
+               catalog_signature=None) -> Optional[List[Tuple[str, float]]]:
+        """The user's batch ranking as [(book id, score), ...], or None.
+
+        None also when the favorites or the catalog (``catalog_signature``)
+        changed since the batch ran.
+        """
+        store = self._current()
+        if store is None:
+            return None
+        if store['catalog'] != catalog_digest(catalog_signature):
+            self.outdated += 1
+            return None
+        data, key = store['data'], user_key(user_id)
+        low, high = 0, store['users']
+        while low < high:
+            middle = (low + high) // 2
+            position = store['users_at'] + middle * USER_RECORD.size
+            found = data[position:position + 16]
+            if found < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low >= store['users']:
+            return None
+        found, digest = USER_RECORD.unpack_from(data, store['users_at'] + low * USER_RECORD.size)
+        if found != key:
+            return None
+        if digest != favorites_digest(favorites):
+            self.stale += 1
+            return None
+
+        self.hits += 1
+        ranked = []
+        base = store['results_at'] + low * store['slots'] * SLOT.size
+        for slot in range(store['slots']):
+            ordinal, score = SLOT.unpack_from(data, base + slot * SLOT.size)
+            if ordinal == EMPTY_SLOT:
+                break
+            ranked.append((self._book_id(store, ordinal), score))
+        return ranked
+
+    def stats(self):
+        store = self._current()
+        return {
+            'pid': os.getpid(),
+            'users': store['users'] if store else 0,
+            'created': store['created'] if store else None,
+            'hits': self.hits,
+            'stale': self.stale,
+            'outdated': self.outdated,
+        }
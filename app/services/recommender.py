@@ -0,0 +1,132 @@
+import logging
+import random
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    logging.warning("numpy not available, personal recommendations fall back to tag matching")
+
+
+class TagAffinityEngine:
+    """Rank the catalog against a user's tag affinity with sparse postings.
+
+    For every tag it keeps the ordinals of the books carrying it and their
+    weight in the books' L2-normalised tag indicator vectors (a sparse
+    tag x book matrix, one row per tag).  A user's affinity vector counts
+    how often each tag appears among their favorite books; only the rows
+    of those tags are summed, giving every book that shares a tag its
+    cosine similarity to the user's taste, and ``argpartition`` pulls out
+    the top k from the books with a positive score.  Callers fill up short
+    lists with random books.
+    """
+
+    # Candidates kept per requested result, so equal scores can be shuffled
+    TIE_POOL = 4
+
+    def __init__(self, books):
+        self.books = tuple(books)
+        self.ordinals = {book.id: ordinal for ordinal, book in enumerate(self.books)}
+        self.tag_ids = {}
+        members = []
+        sizes = []
+        for ordinal, book in enumerate(self.books):
+            tags = set(book.tag)
+            sizes.append(len(tags))
+            for tag in tags:
+                tag_id = self.tag_ids.setdefault(tag, len(self.tag_ids))
+                if tag_id == len(members):
+                    members.append([])
+                members[tag_id].append(ordinal)
+
+        sizes = np.array(sizes, dtype=np.float32)
+        sizes[sizes == 0] = 1.0
+        weights = 1.0 / np.sqrt(sizes)
+        # Per tag: (ordinals of its books, their normalised weights)
+        self.postings = []
+        for ordinals in members:
+            ordinals = np.array(ordinals, dtype=np.int32)
+            self.postings.append((ordinals, weights[ordinals]))
+
+    def affinity(self, favorite_ids):
+        """Tag weight vector from the user's favorite books"""
+        vector = np.zeros(len(self.tag_ids), dtype=np.float32)
+        for book_id in favorite_ids:
+            ordinal = self.ordinals.get(book_id)
+            if ordinal is None:
+                continue
+            for tag in set(self.books[ordinal].tag):
+                vector[self.tag_ids[tag]] += 1.0
+        return vector
+
+    def scores(self, favorite_ids):
+        """Score of every book (zero without a shared tag), or None without favorite tags"""
+        vector = self.affinity(favorite_ids)
+        tag_ids = np.flatnonzero(vector)
+        if not len(tag_ids):
+            return None
+        # Sum only the user's tag rows; bincount adds them up in one C loop
+        ordinals = np.concatenate([self.postings[tag_id][0] for tag_id in tag_ids])
+        weights = np.concatenate([self.postings[tag_id][1] * vector[tag_id] for tag_id in tag_ids])
+        return np.bincount(ordinals, weights=weights, minlength=len(self.books)).astype(np.float32)
+
+    def recommend(self, favorite_ids, count, boost=None, boost_weight=0.5):
+        """Up to ``count`` books with the highest positive score, favorites excluded"""
+        return pick_top(self.rank(favorite_ids, count * self.TIE_POOL, boost, boost_weight), count)
+
+    def rank(self, favorite_ids, pool_size, boost=None, boost_weight=0.5):
+        """The ``pool_size`` best (book, score) pairs, highest score first, favorites excluded.
+
+        ``boost`` maps book ids to a second signal (e.g. co-favorite scores);
+        both signals are scaled to a maximum of 1 and mixed with
+        ``boost_weight``.
+        """
+        scores = self.scores(favorite_ids)
+        if pool_size <= 0 or (scores is None and not boost):
+            return []
+        if scores is None:
+            scores = np.zeros(len(self.books), dtype=np.float32)
+        if boost:
+            top = scores.max()
+            if top > 0:
+                scores *= (1.0 - boost_weight) / top
+            strongest = max(boost.values())
+            for book_id, value in boost.items():
+                ordinal = self.ordinals.get(book_id)
+                if ordinal is not None:
+                    scores[ordinal] += boost_weight * value / strongest
+        for book_id in favorite_ids:
+            ordinal = self.ordinals.get(book_id)
+            if ordinal is not None:
+                scores[ordinal] = -1.0
+
+        # Select among the scored books only; the zero-score majority would
+        # make argpartition slow for users with one or two favorites
+        pool = np.flatnonzero(scores > 0)
+        if pool_size < len(pool):
+            pool = pool[np.argpartition(scores[pool], -pool_size)[-pool_size:]]
+        pool = pool[np.argsort(-scores[pool], kind='stable')]
+        return [(self.books[ordinal], float(scores[ordinal])) for ordinal in pool]
+
+
+def pick_top(ranked, count):
+    """The first ``count`` books of a ranked list, with equal scores in random order.
+
+    Cheap enough to run on every page view over a cached ranking, so the
+    list still varies between visits.
+    """
+    picked = []
+    position = 0
+    while position < len(ranked) and len(picked) < count:
+        end = position
+        while end < len(ranked) and ranked[end][1] == ranked[position][1]:
+            end += 1
+        group = [book for book, _ in ranked[position:end]]
+        if len(group) > count - len(picked):
+            group = random.sample(group, count - len(picked))
+        else:
+            random.shuffle(group)
+        picked.extend(group)
+        position = end
+    return picked
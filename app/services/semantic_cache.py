@@ -0,0 +1,166 @@
+import os
+import threading
+import zlib
+from collections import deque
+from typing import Any, Dict, FrozenSet, List, Optional
+
+from app.services.fuzzy_search import MIN_FUZZY_LENGTH, bounded_distance, max_edits
+from app.services.nlp_cache import normalize_query
+from app.services.text_processing import STOPWORDS
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Query vector length; hash collisions are rare at this size for short queries
+DIMENSIONS = 1024
+# Weight of a whole word against one of its character trigrams
+WORD_WEIGHT = 2.0
+# Similarities this far below the threshold are recorded as near misses
+NEAR_MISS_MARGIN = 0.1
+# Closest stored queries whose words are compared per lookup
+MAX_CANDIDATES = 5
+# Request phrasing that does not change which books are wanted
+QUERY_FILLERS = frozenset("""
+belajar mempelajari cari carikan mencari minta mohon rekomendasi rekomendasikan referensi tolong mau
+""".split())
+
+
+def _bucket(feature: str) -> int:
+    # crc32 is stable across processes, unlike hash()
+    return zlib.crc32(feature.encode('utf-8'))
+
+
+def terms(query: str) -> FrozenSet[str]:
+    """Meaningful query words, so "buku tentang X" and "belajar X" both reduce to X"""
+    return frozenset(word for word in normalize_query(query).split()
+                     if word not in STOPWORDS and word not in QUERY_FILLERS)
+
+
+def covers(words: FrozenSet[str], others: FrozenSet[str]) -> bool:
+    """Every word in ``words`` is in ``others``, exactly or with a small typo"""
+    for word in words - others:
+        if len(word) < MIN_FUZZY_LENGTH:
+            return False
+        limit = max_edits(word)
+        if not any(bounded_distance(word, other, limit) <= limit for other in others):
+            return False
+    return True
+
+
+def embed(query: str) -> 'np.ndarray':
+    """L2-normalised hashed vector of the query's ``terms`` and their character trigrams"""
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+    for word in sorted(terms(query)):
+        features = [(word, WORD_WEIGHT)]
+        padded = f' {word} '
+        features += [(padded[i:i + 3], 1.0) for i in range(len(padded) - 2)]
+        for feature, weight in features:
+            bucket = _bucket(feature)
+            vector[bucket % DIMENSIONS] += weight if bucket & 0x80000000 else -weight
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+class SemanticQueryCache:
+    """Per-worker cache of NLP answers keyed by query similarity, in front of Gemini.
+
+    Each answered query is one row of a numpy matrix; a new query is
+    compared with all rows in one matrix-vector product.  The closest
+    answer is reused when its cosine similarity reaches the threshold and
+    both queries have the same meaningful words (in any order, small typos
+    allowed): similarity alone cannot tell a paraphrase from a narrower
+    question ("jaringan komputer" vs "keamanan jaringan komputer" is 0.83).
+    Entries belong to one catalog ``version``; when full the oldest row is
+    overwritten.
+    """
+
+    def __init__(self, max_entries: int = 2000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._matrix = np.zeros((max_entries, DIMENSIONS), dtype=np.float32) if NUMPY_AVAILABLE else None
+        self._entries: List[Optional[tuple]] = [None] * max_entries
+        self._rows: Dict[str, int] = {}
+        self._next = 0
+        self._count = 0
+        self._version = None
+        self.lookups = 0
+        self.hits = 0
+        self.near_misses = 0
+        # Recent (query, closest stored query, similarity, reused?) samples for tuning the threshold
+        self.recent = deque(maxlen=10)
+
+    def _check_version(self, version: str):
+        if version != self._version:
+            self._version = version
+            self._rows.clear()
+            self._entries = [None] * self.max_entries
+            self._next = self._count = 0
+
+    def get(self, query: str, version: str, threshold: float) -> Optional[Dict[str, Any]]:
+        """Answer of the most similar stored query, if it reaches ``threshold`` and has the same words"""
+        if self._matrix is None or threshold > 1.0:
+            return None
+        vector = embed(query)
+        with self._lock:
+            self._check_version(version)
+            self.lookups += 1
+            if not self._count or not vector.any():
+                return None
+            similarities = self._matrix[:self._count] @ vector
+            rows = np.flatnonzero(similarities >= threshold - NEAR_MISS_MARGIN)
+            if not len(rows):
+                return None
+            rows = rows[np.argsort(-similarities[rows], kind='stable')][:MAX_CANDIDATES]
+            words = terms(query)
+            for row in rows:
+                similarity = float(similarities[row])
+                matched_query, value, matched_words = self._entries[row]
+                if similarity >= threshold and covers(words, matched_words) and covers(matched_words, words):
+                    self.hits += 1
+                    self.recent.appendleft((query, matched_query, round(similarity, 3), True))
+                    return value
+            # Too far or different words: record a near miss against the closest candidate
+            self.near_misses += 1
+            self.recent.appendleft((query, self._entries[rows[0]][0], round(float(similarities[rows[0]]), 3), False))
+            return None
+
+    def put(self, query: str, version: str, value: Dict[str, Any]):
+        if self._matrix is None:
+            return
+        vector = embed(query)
+        if not vector.any():
+            return
+        key = normalize_query(query)
+        with self._lock:
+            self._check_version(version)
+            row = self._rows.get(key)
+            if row is None:
+                row = self._next
+                self._next = (self._next + 1) % self.max_entries
+                self._count = max(self._count, row + 1)
+                evicted = self._entries[row]
+                if evicted is not None:
+                    self._rows.pop(normalize_query(evicted[0]), None)
+                self._rows[key] = row
+            self._matrix[row] = vector
+            self._entries[row] = (query, value, terms(query))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'entries': len(self._rows),
+                'max_entries': self.max_entries,
+                'lookups': self.lookups,
+                'hits': self.hits,
+                'near_misses': self.near_misses,
+                'recent': list(self.recent),
+            }
+
+
+def from_environment() -> SemanticQueryCache:
+    """Cache of NLP_SEMANTIC_CACHE_SIZE entries per worker"""
+    return SemanticQueryCache(int(os.environ.get('NLP_SEMANTIC_CACHE_SIZE', 2000)))
@@ -0,0 +1,240 @@
+import fcntl
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from app.services.text_processing import tokenize
+from app.storage.json_backend import write_json_atomic
+
+try:
+    import numpy as np
+    from scipy import sparse
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+    logging.warning("scipy not available, similar books fall back to tag matching")
+
+# Weight of text similarity (TF-IDF of title + description); the rest goes to shared tags
+TEXT_WEIGHT = 0.7
+# A title word says more about a book than one word of its description
+TITLE_REPEAT = 3
+# Neighbours stored per book
+DEFAULT_NEIGHBOURS = 10
+# Score cells (rows x books) per block when computing all neighbours:
+# 8M float32 = 32 MB dense, whatever the catalog size
+BLOCK_CELLS = 8_000_000
+# Minimum seconds between cache file checks while the neighbour lists are stale
+STALE_CHECK_SECONDS = 5.0
+
+
+class SimilarityIndex:
+    """Content similarity between books.
+
+    Each book is a sparse row: L2-normalised TF-IDF over title and
+    description next to its normalised tag vector.  With square-root
+    weights one dot product gives
+    TEXT_WEIGHT * cosine(text) + (1 - TEXT_WEIGHT) * cosine(tags).
+
+    The top-k neighbours of every book are computed once per catalog
+    version and stored in ``cache_dir``, so lookups read a dict.  That
+    O(N^2) pass never runs in a request: while the cache file belongs to an
+    older catalog its lists are served and one background thread (one
+    process, guarded by a file lock) recomputes them; the precompute CLI
+    calls ``refresh`` directly.  Requests build the matrix only for
+    limit > k.
+    """
+
+    def __init__(self, books: Sequence, description: Callable[[object], str],
+                 cache_dir: str, signature, k: int = DEFAULT_NEIGHBOURS):
+        self.books = tuple(books)
+        self.ordinals = {book.id: ordinal for ordinal, book in enumerate(self.books)}
+        self.k = k
+        self._description = description
+        self._matrix = None
+        self.cache_path = os.path.join(cache_dir, 'similar_books.json')
+        self.token = hashlib.sha1(json.dumps([signature, k, TEXT_WEIGHT]).encode('utf-8')).hexdigest()[:16]
+        self._lock = threading.Lock()
+        self._rebuilding = False
+        self._checked = time.monotonic()
+
+        # Lists from another catalog version are served until the new ones are ready
+        self.neighbours: Dict[str, List[Tuple[str, float]]] = {}
+        self.stale = True
+        self._loaded_version = None
+        self._load()
+
+    def similar(self, book_id: str, limit: int = 3) -> List[Tuple[str, float]]:
+        """(id, score) pairs of the books most similar to ``book_id``.
+
+        While the lists are stale, books added since have no neighbours yet.
+        """
+        if self.stale:
+            self._refresh_stale()
+        if limit <= self.k:
+            return self.neighbours.get(book_id, [])[:limit]
+        ordinal = self.ordinals.get(book_id)
+        if ordinal is None:
+            return []
+        matrix = self.matrix()
+        scores = (matrix[ordinal] @ matrix.T).toarray().ravel()
+        return self._top(scores, ordinal, limit)
+
+    def refresh(self, wait: bool = True) -> bool:
+        """Recompute and store all neighbour lists if they are stale.
+
+        With ``wait=False`` this is skipped while another process computes
+        them.  Returns True once the lists match this catalog version.
+        """
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            lock_file = open(self.cache_path + '.lock', 'a')
+        except OSError as e:
+            logging.warning(f"Could not lock similar books cache: {str(e)}")
+            lock_file = None
+        try:
+            if lock_file is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return False
+            # Another process may have just finished this version
+            self._load()
+            if self.stale:
+                started = time.perf_counter()
+                self.neighbours = self._compute_neighbours()
+                self.stale = False
+                self._write_neighbours()
+                logging.info(f"Computed similar books for {len(self.books)} books "
+                             f"in {time.perf_counter() - started:.1f}s")
+            return True
+        finally:
+            if lock_file is not None:
+                lock_file.close()
+
+    def _refresh_stale(self):
+        """Pick up another process's result or start a background rebuild, at most every STALE_CHECK_SECONDS"""
+        with self._lock:
+            now = time.monotonic()
+            if self._rebuilding or now - self._checked < STALE_CHECK_SECONDS:
+                return
+            self._checked = now
+            self._load()
+            if not self.stale:
+                return
+            self._rebuilding = True
+        threading.Thread(target=self._rebuild, name='similar-books', daemon=True).start()
+
+    def _rebuild(self):
+        try:
+            self.refresh(wait=False)
+        except Exception as e:
+            logging.error(f"Computing similar books failed: {str(e)}")
+        finally:
+            self._rebuilding = False
+
+    def matrix(self):
+        if self._matrix is None:
+            self._matrix = self._build_matrix()
+        return self._matrix
+
+    def _build_matrix(self):
+        documents = []
+        for book in self.books:
+            text = ' '.join([book.judul or ''] * TITLE_REPEAT + [self._description(book) or ''])
+            documents.append(Counter(tokenize(text)))
+
+        vocabulary: Dict[str, int] = {}
+        document_frequency = Counter()
+        for counts in documents:
+            document_frequency.update(counts.keys())
+        for term in document_frequency:
+            vocabulary[term] = len(vocabulary)
+
+        total = len(documents)
+        idf = {term: math.log((1 + total) / (1 + df)) + 1.0 for term, df in document_frequency.items()}
+        rows, cols, values = [], [], []
+        for ordinal, counts in enumerate(documents):
+            for term, count in counts.items():
+                rows.append(ordinal)
+                cols.append(vocabulary[term])
+                values.append((1.0 + math.log(count)) * idf[term])
+        text = sparse.csr_matrix((values, (rows, cols)), shape=(total, len(vocabulary)), dtype=np.float32)
+
+        tag_ids: Dict[str, int] = {}
+        rows, cols = [], []
+        for ordinal, book in enumerate(self.books):
+            for tag in set(book.tag):
+                rows.append(ordinal)
+                cols.append(tag_ids.setdefault(tag, len(tag_ids)))
+        tags = sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)),
+                                 shape=(total, len(tag_ids)), dtype=np.float32)
+
+        combined = sparse.hstack([
+            _normalize_rows(text) * math.sqrt(TEXT_WEIGHT),
+            _normalize_rows(tags) * math.sqrt(1.0 - TEXT_WEIGHT),
+        ], format='csr')
+        logging.info(f"Built similarity matrix: {total} books, {len(vocabulary)} terms, {len(tag_ids)} tags")
+        return combined
+
+    def _compute_neighbours(self) -> Dict[str, List[Tuple[str, float]]]:
+        neighbours: Dict[str, List[Tuple[str, float]]] = {}
+        if not self.books:
+            return neighbours
+        matrix = self.matrix()
+        transposed = matrix.T.tocsc()
+        block_size = max(1, BLOCK_CELLS // len(self.books))
+        for start in range(0, len(self.books), block_size):
+            block = (matrix[start:start + block_size] @ transposed).toarray()
+            for offset, scores in enumerate(block):
+                ordinal = start + offset
+                neighbours[self.books[ordinal].id] = self._top(scores, ordinal, self.k)
+        return neighbours
+
+    def _top(self, scores, ordinal: int, limit: int) -> List[Tuple[str, float]]:
+        scores[ordinal] = -1.0
+        limit = min(limit, len(scores) - 1)
+        if limit <= 0:
+            return []
+        top = np.argpartition(scores, -limit)[-limit:]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(self.books[i].id, round(float(scores[i]), 4)) for i in top if scores[i] > 0]
+
+    def _load(self):
+        """Load the lists from the cache file if it changed since the last read"""
+        try:
+            stat = os.stat(self.cache_path)
+        except OSError:
+            return
+        version = (stat.st_mtime_ns, stat.st_size)
+        if version == self._loaded_version:
+            return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        self._loaded_version = version
+        if stored.get('k', self.k) < self.k:
+            return
+        self.neighbours = {book_id: [tuple(pair) for pair in pairs] for book_id, pairs in stored['neighbours'].items()}
+        self.stale = stored.get('token') != self.token
+
+    def _write_neighbours(self):
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            write_json_atomic(self.cache_path, {'token': self.token, 'k': self.k, 'neighbours': self.neighbours},
+                              indent=None)
+        except OSError as e:
+            logging.warning(f"Could not persist similar books: {str(e)}")
+
+
+def _normalize_rows(matrix):
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.diags(1.0 / norms).dot(matrix)
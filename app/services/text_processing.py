@@ -0,0 +1,29 @@
+import re
+import unicodedata
+from typing import List
+
+# Common Indonesian (and some English) words that do not tell one book from another
+STOPWORDS = frozenset("""
+ada adalah agar akan aku anda apa apakah atau bagaimana bagi bahkan bahwa banyak baru
+beberapa begitu belum berbagai bersama besar bisa buku cara dalam dan dapat dari demikian
+di dia dengan dua hal hanya harus hingga ia ingin ini itu jadi jika juga jenis kami kamu
+karena kata ke kepada ketika kita lain lebih lalu maka masih melalui memang mereka
+merupakan mulai namun oleh pada para per perlu pula sama saat saja sampai sangat satu
+saya secara sebagai sebelum sedang seperti serta setelah setiap sudah supaya tak tanpa
+telah tentang tentu terhadap termasuk tersebut tetapi tidak untuk yaitu yang
+the of and a an to in for on with by is are this that from as at be or it its
+""".split())
+
+_TOKEN_PATTERN = re.compile(r"[^\W\d_]+", re.UNICODE)
+
+
+def normalize(text: str) -> str:
+    """Casefolded and without diacritics, so "Café" and "cafe" match"""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+
+def tokenize(text: str, min_length: int = 2) -> List[str]:
+    """Split text into words (letters only), dropping stopwords and short tokens"""
+    return [token for token in _TOKEN_PATTERN.findall(normalize(text))
+            if len(token) >= min_length and token not in STOPWORDS]
@@ -0,0 +1,44 @@
+# Storage backends package
+import os
+import threading
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def create_storage(backend=None):
+    """Build the backend selected by STORAGE_BACKEND ('json', 'journal' or 'sqlite')"""
+    backend = (backend or os.environ.get('STORAGE_BACKEND', 'json')).lower()
+    if backend == 'json':
+        from app.storage.json_backend import JsonStorage
+        return JsonStorage(os.environ.get('DATA_DIR', 'data'))
+    if backend == 'journal':
+        from app.storage.journal_backend import JournalStorage, DEFAULT_COMPACT_BYTES
+        compact_bytes = int(os.environ.get('JOURNAL_COMPACT_BYTES', DEFAULT_COMPACT_BYTES))
+        return JournalStorage(os.environ.get('DATA_DIR', 'data'), compact_bytes)
+    if backend == 'sqlite':
+        from app.storage.sqlite_backend import SQLiteStorage
+        return SQLiteStorage(os.environ.get('SQLITE_DATABASE_PATH', 'data/rekobuku.sqlite3'))
+    raise ValueError(f"Unknown STORAGE_BACKEND '{backend}', expected 'json', 'journal' or 'sqlite'")
+
+
+def cache_dir():
+    """Directory for derived, rebuildable files (indexes, precomputed results)"""
+    return os.path.join(os.environ.get('DATA_DIR', 'data'), 'cache')
+
+
+def get_storage():
+    """Process-wide storage backend, created on first use"""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = create_storage()
+    return _storage
+
+
+def set_storage(storage):
+    """Swap the active backend (migrations, benchmarks)"""
+    global _storage
+    with _storage_lock:
+        _storage = storage
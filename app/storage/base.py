@@ -0,0 +1,80 @@
+class StorageBackend:
+    """Interface shared by the storage backends behind Book, User and Settings.
+
+    Records are exchanged as plain dicts using the JSON field names.  Every
+    mutating method receives ``collection``, a zero-argument callable that
+    returns the full list of records *after* the change; backends that have
+    to rewrite a whole collection (JSON files) use it, row-based backends
+    ignore it.  Mutations return the new ``signature`` of the collection.
+    """
+
+    name = None
+
+    def signature(self, collection):
+        """Token that changes whenever 'books', 'users' or 'settings' changes"""
+        raise NotImplementedError
+
+    # Books
+    def load_books(self):
+        raise NotImplementedError
+
+    def save_book(self, book_data, collection):
+        raise NotImplementedError
+
+    def delete_book(self, book_id, collection):
+        raise NotImplementedError
+
+    def load_book_summaries(self):
+        """Books without 'deskripsi_singkat' but with a short 'deskripsi_cuplikan'"""
+        from app.storage.descriptions import split_description
+        return [split_description(book_data)[0] for book_data in self.load_books()]
+
+    def load_description(self, book_id):
+        for book_data in self.load_books():
+            if book_data['id'] == book_id:
+                return book_data.get('deskripsi_singkat', book_data.get('description'))
+        return None
+
+    # Users
+    def load_users(self):
+        raise NotImplementedError
+
+    def get_user(self, user_id):
+        for user_data in self.load_users():
+            if user_data['id'] == user_id:
+                return user_data
+        return None
+
+    def get_user_by_email(self, email):
+        for user_data in self.load_users():
+            if user_data['email'] == email:
+                return user_data
+        return None
+
+    def get_user_by_name(self, nama):
+        nama = nama.casefold()
+        for user_data in self.load_users():
+            if user_data.get('nama') is not None and user_data['nama'].casefold() == nama:
+                return user_data
+        return None
+
+    def save_user(self, user_data, collection):
+        raise NotImplementedError
+
+    def delete_user(self, user_id, collection):
+        raise NotImplementedError
+
+    def add_favorite(self, user_id, book_id, user_data, collection):
+        """Persist a favorite added to ``user_data``; backends may record just the change"""
+        return self.save_user(user_data, collection)
+
+    def remove_favorite(self, user_id, book_id, user_data, collection):
+        return self.save_user(user_data, collection)
+
+    # Settings
+    def load_settings(self):
+        """Return the settings dict, or None when nothing has been stored yet"""
+        raise NotImplementedError
+
+    def save_settings(self, settings):
+        raise NotImplementedError
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import logging
+import mmap
+import os
+import threading
+
+from app.storage.json_backend import write_json_atomic
+
+# Characters of the description kept in the resident summary for list views
+EXCERPT_LENGTH = 100
+
+
+def split_description(book_data):
+    """Return (summary, description) for a stored book record"""
+    summary = dict(book_data)
+    # Old records use 'description' instead of 'deskripsi_singkat'
+    description = summary.pop('deskripsi_singkat', None)
+    if description is None:
+        description = summary.pop('description', None) or ''
+    summary['deskripsi_cuplikan'] = description[:EXCERPT_LENGTH]
+    return summary, description
+
+
+class DescriptionStore:
+    """Compact summary index plus an offset-indexed description blob.
+
+    Derived from the full book collection of a file-based backend and
+    written to ``cache_dir``: ``catalog_summary.json`` holds every book
+    without its description (plus a short excerpt) and the byte range of
+    the description inside ``descriptions-<token>.bin``.  The blob is
+    memory-mapped, so descriptions are read on demand instead of living in
+    every worker's heap.  Both files are rebuilt only when the collection
+    signature changes.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.summary_path = os.path.join(cache_dir, 'catalog_summary.json')
+        self._lock = threading.Lock()
+        self._offsets = {}
+        self._blob = None
+
+    def load(self, signature, load_books):
+        """Return book summaries for ``signature``, rebuilding the store if it is stale"""
+        token = hashlib.sha1(json.dumps(signature).encode('utf-8')).hexdigest()[:16]
+        for attempt in range(2):
+            index = self._read_index(token)
+            try:
+                blob = self._map(index) if index is not None else None
+            except OSError:
+                # Another worker replaced the blob between reading the index and opening it
+                index = None
+            if index is not None:
+                break
+            index = self._build(token, load_books())
+            try:
+                blob = self._map(index)
+                break
+            except OSError:
+                # A concurrent rebuild for a newer signature removed this blob; try once more
+                if attempt:
+                    raise
+
+        summaries = []
+        offsets = {}
+        for record in index['books']:
+            offsets[record['id']] = (record.pop('offset'), record.pop('length'))
+            summaries.append(record)
+
+        with self._lock:
+            # Readers holding the previous map keep working; it is released with its last reference
+            self._blob = blob
+            self._offsets = offsets
+        return summaries
+
+    def get(self, book_id):
+        with self._lock:
+            blob = self._blob
+            position = self._offsets.get(book_id)
+        if position is None or blob is None:
+            return None
+        offset, length = position
+        return blob[offset:offset + length].decode('utf-8')
+
+    def _map(self, index):
+        blob_path = os.path.join(self.cache_dir, index['blob'])
+        with open(blob_path, 'rb') as f:
+            if not os.fstat(f.fileno()).st_size:
+                return None
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _read_index(self, token):
+        try:
+            with open(self.summary_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        return index if index.get('token') == token else None
+
+    def _build(self, token, books_data):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        blob_name = f'descriptions-{token}.bin'
+        blob_path = os.path.join(self.cache_dir, blob_name)
+        tmp_path = f'{blob_path}.{os.getpid()}.tmp'
+
+        records = []
+        offset = 0
+        with open(tmp_path, 'wb') as f:
+            for book_data in books_data:
+                summary, description = split_description(book_data)
+                encoded = description.encode('utf-8')
+                f.write(encoded)
+                summary['offset'] = offset
+                summary['length'] = len(encoded)
+                offset += len(encoded)
+                records.append(summary)
+        os.replace(tmp_path, blob_path)
+        written = os.stat(blob_path).st_mtime_ns
+
+        index = {'token': token, 'blob': blob_name, 'books': records}
+        write_json_atomic(self.summary_path, index, indent=None)
+
+        # Only drop older blobs; a concurrent rebuild may have just written a newer one
+        for name in os.listdir(self.cache_dir):
+            if name.startswith('descriptions-') and name.endswith('.bin') and name != blob_name:
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    if os.stat(path).st_mtime_ns < written:
+                        os.remove(path)
+                except OSError:
+                    pass
+        logging.info(f"Rebuilt description store: {len(records)} books, {offset} bytes of descriptions")
+        return index
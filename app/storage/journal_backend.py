@@ -0,0 +1,161 @@
+import fcntl
+import json
+import logging
+import os
+from contextlib import contextmanager
+
+from app.storage.json_backend import JsonStorage, write_json_atomic
+
+# Compact a collection's journal into its snapshot once it grows past this size
+DEFAULT_COMPACT_BYTES = 1024 * 1024
+
+
+class JournalStorage(JsonStorage):
+    """JSON snapshots plus an append-only journal per collection.
+
+    Every book or user mutation is appended to ``<collection>.journal.jsonl``
+    as one small JSON line, so a write costs the size of the change rather
+    than the size of the dataset.  Loading reads the snapshot and replays
+    the journal on top of it.  Once a journal passes ``compact_bytes`` it is
+    folded into a new snapshot (written atomically) and truncated.
+
+    All journal operations are idempotent, so a crash between replacing the
+    snapshot and truncating the journal only replays records that are
+    already applied.  A torn final line from a crash mid-append is ignored.
+    """
+
+    name = 'journal'
+
+    def __init__(self, data_dir='data', compact_bytes=DEFAULT_COMPACT_BYTES):
+        super().__init__(data_dir)
+        self.compact_bytes = compact_bytes
+        self.journal_paths = {
+            'books': os.path.join(data_dir, 'books.journal.jsonl'),
+            'users': os.path.join(data_dir, 'users.journal.jsonl'),
+        }
+        self.lock_path = os.path.join(data_dir, '.journal.lock')
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive lock shared by every worker using this data directory"""
+        os.makedirs(self.data_dir, exist_ok=True)
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def signature(self, collection):
+        snapshot = super().signature(collection)
+        if collection not in self.journal_paths:
+            return snapshot
+        try:
+            stat = os.stat(self.journal_paths[collection])
+            journal = (stat.st_ino, stat.st_size)
+        except OSError:
+            journal = None
+        return (snapshot, journal)
+
+    def _read_journal(self, collection):
+        path = self.journal_paths[collection]
+        if not os.path.exists(path):
+            return []
+        entries = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # Torn record left by a crash mid-append
+                    logging.warning(f"Skipping unreadable journal record in {path}")
+        return entries
+
+    def _append(self, collection, entry):
+        path = self.journal_paths[collection]
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self._locked():
+            with open(path, 'a+b') as f:
+                size = f.seek(0, os.SEEK_END)
+                if size:
+                    f.seek(size - 1)
+                    if f.read(1) != b'\n':
+                        # Terminate a torn record so it cannot swallow this one
+                        line = '\n' + line
+                f.write(line.encode('utf-8'))
+                f.flush()
+                os.fsync(f.fileno())
+            if os.path.getsize(path) >= self.compact_bytes:
+                self._compact(collection)
+        return self.signature(collection)
+
+    def _replay(self, collection, records):
+        index = {record['id']: i for i, record in enumerate(records)}
+        for entry in self._read_journal(collection):
+            op = entry['op']
+            if op == 'put':
+                data = entry['data']
+                if data['id'] in index:
+                    records[index[data['id']]] = data
+                else:
+                    index[data['id']] = len(records)
+                    records.append(data)
+            elif op == 'delete':
+                if index.pop(entry['id'], None) is not None:
+                    records = [record for record in records if record['id'] != entry['id']]
+                    index = {record['id']: i for i, record in enumerate(records)}
+            elif op in ('favorite_add', 'favorite_remove'):
+                position = index.get(entry['user_id'])
+                if position is None:
+                    continue
+                favorites = records[position].setdefault('favorites', [])
+                if op == 'favorite_add' and entry['book_id'] not in favorites:
+                    favorites.append(entry['book_id'])
+                elif op == 'favorite_remove' and entry['book_id'] in favorites:
+                    favorites.remove(entry['book_id'])
+        return records
+
+    def _load(self, collection):
+        return self._replay(collection, self._read(collection, []))
+
+    def _compact(self, collection):
+        """Fold the journal into the snapshot; caller holds the lock"""
+        records = self._load(collection)
+        write_json_atomic(self.paths[collection], records)
+        # Truncate by replacing, so readers see a new inode in the signature
+        write_journal = self.journal_paths[collection] + '.tmp'
+        open(write_journal, 'w').close()
+        os.replace(write_journal, self.journal_paths[collection])
+        logging.info(f"Compacted {collection} journal into {self.paths[collection]} ({len(records)} records)")
+
+    def compact(self):
+        """Compact every journal now (e.g. from a maintenance job)"""
+        with self._locked():
+            for collection in self.journal_paths:
+                self._compact(collection)
+
+    # Books
+    def load_books(self):
+        return self._load('books')
+
+    def save_book(self, book_data, collection):
+        return self._append('books', {'op': 'put', 'data': book_data})
+
+    def delete_book(self, book_id, collection):
+        return self._append('books', {'op': 'delete', 'id': book_id})
+
+    # Users
+    def load_users(self):
+        return self._load('users')
+
+    def save_user(self, user_data, collection):
+        return self._append('users', {'op': 'put', 'data': user_data})
+
+    def delete_user(self, user_id, collection):
+        return self._append('users', {'op': 'delete', 'id': user_id})
+
+    def add_favorite(self, user_id, book_id, user_data, collection):
+        return self._append('users', {'op': 'favorite_add', 'user_id': user_id, 'book_id': book_id})
+
+    def remove_favorite(self, user_id, book_id, user_data, collection):
+        return self._append('users', {'op': 'favorite_remove', 'user_id': user_id, 'book_id': book_id})
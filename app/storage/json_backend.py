@@ -0,0 +1,106 @@
+import json
+import os
+import shutil
+import tempfile
+
+from app.storage.base import StorageBackend
+
+
+def write_json_atomic(path, data, indent=2):
+    """Write JSON to a temporary file and rename it over ``path``.
+
+    A crash mid-write leaves the previous file intact instead of a
+    truncated one.
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=indent, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates the file as 0600; keep the permissions of the file being replaced
+        if os.path.exists(path):
+            shutil.copymode(path, tmp_path)
+        else:
+            os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class JsonStorage(StorageBackend):
+    """Original file-based storage: one JSON document per collection"""
+
+    name = 'json'
+
+    def __init__(self, data_dir='data'):
+        self.data_dir = data_dir
+        self.paths = {
+            'books': os.path.join(data_dir, 'books.json'),
+            'users': os.path.join(data_dir, 'users.json'),
+            'settings': os.path.join(data_dir, 'settings.json'),
+        }
+        self._descriptions = None
+
+    def signature(self, collection):
+        try:
+            stat = os.stat(self.paths[collection])
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _read(self, collection, default):
+        path = self.paths[collection]
+        if not os.path.exists(path):
+            return default
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write(self, collection, data):
+        write_json_atomic(self.paths[collection], data)
+        return self.signature(collection)
+
+    # Books
+    def load_books(self):
+        return self._read('books', [])
+
+    def load_book_summaries(self):
+        return self.descriptions.load(self.signature('books'), self.load_books)
+
+    def load_description(self, book_id):
+        return self.descriptions.get(book_id)
+
+    @property
+    def descriptions(self):
+        if self._descriptions is None:
+            # Imported here: descriptions.py depends on write_json_atomic from this module
+            from app.storage.descriptions import DescriptionStore
+            self._descriptions = DescriptionStore(os.path.join(self.data_dir, 'cache'))
+        return self._descriptions
+
+    def save_book(self, book_data, collection):
+        return self._write('books', collection())
+
+    def delete_book(self, book_id, collection):
+        return self._write('books', collection())
+
+    # Users
+    def load_users(self):
+        return self._read('users', [])
+
+    def save_user(self, user_data, collection):
+        return self._write('users', collection())
+
+    def delete_user(self, user_id, collection):
+        return self._write('users', collection())
+
+    # Settings
+    def load_settings(self):
+        return self._read('settings', None)
+
+    def save_settings(self, settings):
+        return self._write('settings', settings)
@@ -0,0 +1,52 @@
+"""One-shot import of the JSON data files into the SQLite backend.
+
+Usage:
+    python -m app.storage.migrate [--data-dir data] [--database data/rekobuku.sqlite3] [--force]
+"""
+import argparse
+import logging
+import os
+import sys
+
+from app.storage.json_backend import JsonStorage
+from app.storage.sqlite_backend import SQLiteStorage
+
+
+def migrate(data_dir, database, force=False):
+    source = JsonStorage(data_dir)
+    target = SQLiteStorage(database)
+
+    if not force and (target.load_books() or target.load_users()):
+        raise RuntimeError(f"{database} already contains data, use --force to overwrite it")
+
+    # Imported lazily so the storage package does not depend on the models at import time
+    from app.models.book import Book
+    books = [Book.from_dict(book_data).to_dict() for book_data in source.load_books()]
+    users = source.load_users()
+    settings = source.load_settings()
+
+    target.import_all(books, users, settings)
+    logging.info(f"Imported {len(books)} books, {len(users)} users and "
+                 f"{len(settings or {})} settings into {database}")
+    return len(books), len(users)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Import data/*.json into the SQLite storage backend')
+    parser.add_argument('--data-dir', default=os.environ.get('DATA_DIR', 'data'))
+    parser.add_argument('--database', default=os.environ.get('SQLITE_DATABASE_PATH', 'data/rekobuku.sqlite3'))
+    parser.add_argument('--force', action='store_true', help='replace existing rows in the database')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        migrate(args.data_dir, args.database, force=args.force)
+    except RuntimeError as e:
+        logging.error(str(e))
+        return 1
+    print(f"Set STORAGE_BACKEND=sqlite to use {args.database}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
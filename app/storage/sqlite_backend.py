@@ -0,0 +1,207 @@
+import json
+import os
+import sqlite3
+import threading
+
+from app.storage.base import StorageBackend
+from app.storage.descriptions import EXCERPT_LENGTH
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    id TEXT PRIMARY KEY,
+    judul TEXT NOT NULL,
+    penulis TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    foto TEXT,
+    deskripsi_singkat TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    nama TEXT,
+    email TEXT NOT NULL,
+    password_hash TEXT NOT NULL,
+    favorites TEXT NOT NULL,
+    profile_image TEXT,
+    role TEXT NOT NULL DEFAULT 'pengguna'
+);
+CREATE INDEX IF NOT EXISTS idx_users_email ON users (email);
+CREATE INDEX IF NOT EXISTS idx_users_nama ON users (nama COLLATE NOCASE);
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS generations (
+    collection TEXT PRIMARY KEY,
+    generation INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO generations (collection, generation) VALUES ('books', 0), ('users', 0), ('settings', 0);
+"""
+
+BOOK_COLUMNS = ('id', 'judul', 'penulis', 'tag', 'foto', 'deskripsi_singkat')
+USER_COLUMNS = ('id', 'nama', 'email', 'password_hash', 'favorites', 'profile_image', 'role')
+
+
+class SQLiteStorage(StorageBackend):
+    """SQLite storage in WAL mode, safe to share between gunicorn workers.
+
+    Each collection has a generation counter that is bumped in the same
+    transaction as the write, so caches in other workers can tell when to
+    reload.  Rows keep their insertion order through SQLite's rowid.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path='data/rekobuku.sqlite3'):
+        self.path = path
+        self._local = threading.local()
+
+    def connect(self):
+        """Per-thread connection, reopened after a fork"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(SCHEMA)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _write(self, collection, statements):
+        """Run statements in one transaction and bump the collection generation"""
+        conn = self.connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for sql, params in statements:
+                conn.execute(sql, params)
+            conn.execute('UPDATE generations SET generation = generation + 1 WHERE collection = ?', (collection,))
+            generation = conn.execute('SELECT generation FROM generations WHERE collection = ?', (collection,)).fetchone()[0]
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return generation
+
+    def signature(self, collection):
+        row = self.connect().execute('SELECT generation FROM generations WHERE collection = ?', (collection,)).fetchone()
+        return row[0] if row else None
+
+    # Books
+    @staticmethod
+    def _book_from_row(row):
+        book_data = dict(row)
+        book_data['tag'] = json.loads(book_data['tag'])
+        return book_data
+
+    @staticmethod
+    def _book_params(book_data):
+        return (book_data['id'], book_data['judul'], book_data['penulis'],
+                json.dumps(book_data['tag'], ensure_ascii=False), book_data['foto'],
+                book_data['deskripsi_singkat'])
+
+    def load_books(self):
+        rows = self.connect().execute(f"SELECT {', '.join(BOOK_COLUMNS)} FROM books ORDER BY rowid")
+        return [self._book_from_row(row) for row in rows]
+
+    def load_book_summaries(self):
+        columns = ', '.join(BOOK_COLUMNS[:-1])
+        rows = self.connect().execute(
+            f"SELECT {columns}, substr(deskripsi_singkat, 1, ?) AS deskripsi_cuplikan FROM books ORDER BY rowid",
+            (EXCERPT_LENGTH,))
+        return [self._book_from_row(row) for row in rows]
+
+    def load_description(self, book_id):
+        row = self.connect().execute('SELECT deskripsi_singkat FROM books WHERE id = ?', (book_id,)).fetchone()
+        return row[0] if row else None
+
+    def _upsert_book_sql(self):
+        assignments = ', '.join(f'{column} = excluded.{column}' for column in BOOK_COLUMNS[1:])
+        return (f"INSERT INTO books ({', '.join(BOOK_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?) "
+                f"ON CONFLICT(id) DO UPDATE SET {assignments}")
+
+    def save_book(self, book_data, collection):
+        return self._write('books', [(self._upsert_book_sql(), self._book_params(book_data))])
+
+    def delete_book(self, book_id, collection):
+        return self._write('books', [('DELETE FROM books WHERE id = ?', (book_id,))])
+
+    # Users
+    @staticmethod
+    def _user_from_row(row):
+        if row is None:
+            return None
+        user_data = dict(row)
+        user_data['favorites'] = json.loads(user_data['favorites'])
+        return user_data
+
+    @staticmethod
+    def _user_params(user_data):
+        return (user_data['id'], user_data.get('nama'), user_data['email'], user_data['password_hash'],
+                json.dumps(user_data.get('favorites') or [], ensure_ascii=False),
+                user_data.get('profile_image'), user_data.get('role') or 'pengguna')
+
+    def _select_users(self, where='', params=()):
+        sql = f"SELECT {', '.join(USER_COLUMNS)} FROM users {where} ORDER BY rowid"
+        return self.connect().execute(sql, params)
+
+    def load_users(self):
+        return [self._user_from_row(row) for row in self._select_users()]
+
+    def get_user(self, user_id):
+        return self._user_from_row(self._select_users('WHERE id = ?', (user_id,)).fetchone())
+
+    def get_user_by_email(self, email):
+        return self._user_from_row(self._select_users('WHERE email = ?', (email,)).fetchone())
+
+    def get_user_by_name(self, nama):
+        if not nama.isascii():
+            # COLLATE NOCASE only folds ASCII letters
+            return super().get_user_by_name(nama)
+        return self._user_from_row(self._select_users('WHERE nama = ? COLLATE NOCASE', (nama,)).fetchone())
+
+    def _upsert_user_sql(self):
+        assignments = ', '.join(f'{column} = excluded.{column}' for column in USER_COLUMNS[1:])
+        return (f"INSERT INTO users ({', '.join(USER_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                f"ON CONFLICT(id) DO UPDATE SET {assignments}")
+
+    def save_user(self, user_data, collection):
+        return self._write('users', [(self._upsert_user_sql(), self._user_params(user_data))])
+
+    def delete_user(self, user_id, collection):
+        return self._write('users', [('DELETE FROM users WHERE id = ?', (user_id,))])
+
+    # Settings
+    def load_settings(self):
+        rows = self.connect().execute('SELECT key, value FROM settings').fetchall()
+        if not rows:
+            return None
+        return {row['key']: json.loads(row['value']) for row in rows}
+
+    def save_settings(self, settings):
+        statements = [('DELETE FROM settings', ())]
+        statements += [('INSERT INTO settings (key, value) VALUES (?, ?)', (key, json.dumps(value)))
+                       for key, value in settings.items()]
+        return self._write('settings', statements)
+
+    def import_all(self, books, users, settings):
+        """Replace every collection in a single transaction (used by the migration)"""
+        conn = self.connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM books')
+            conn.execute('DELETE FROM users')
+            conn.execute('DELETE FROM settings')
+            conn.executemany(self._upsert_book_sql(), [self._book_params(book) for book in books])
+            conn.executemany(self._upsert_user_sql(), [self._user_params(user) for user in users])
+            conn.executemany('INSERT INTO settings (key, value) VALUES (?, ?)',
+                             [(key, json.dumps(value)) for key, value in (settings or {}).items()])
+            conn.execute('UPDATE generations SET generation = generation + 1')
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
@@ -1,11 +1,13 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, abort
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, abort, session, Response, stream_with_context
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from flask_wtf.csrf import CSRFProtect
 from werkzeug.utils import secure_filename
 from functools import wraps
 import os
+import json
 import logging
 import re
+import time
 from urllib.parse import urlparse, urljoin
 
 # Load environment variables from .env file (optional - for local development)
@@ -33,7 +35,9 @@ login_manager.login_message = 'Silakan masuk untuk mengakses halaman ini.'
 @login_manager.user_loader
 def load_user(user_id):
     from app.models.user import User
-    return User.get(user_id)
+    # Flask-Login keeps the result for the rest of the request; the session
+    # cache avoids the directory/storage check across requests
+    return User.get_for_session(user_id)
 
 # Admin decorator
 def admin_required(f):
@@ -126,9 +130,12 @@ def check_maintenance():
 from app.models.user import User
 from app.models.book import Book
 from app.models.settings import Settings
+from app.services import async_bridge, bm25, nlp_cache, semantic_cache
 try:
+    from app.services import gemini_service as gemini
     from app.services.gemini_service import GeminiBookRecommendationService
 except ImportError:
+    gemini = None
     GeminiBookRecommendationService = None
 from app.forms.auth import LoginForm, RegisterForm
 from app.forms.book import BookForm, EditBookForm, AIGenerateForm
@@ -144,13 +151,9 @@ def login():
     if form.validate_on_submit():
         # Check if input is email or name
         user = User.get_by_email(form.email.data)
-        if not user:
+        if not user and form.email.data:
             # Try to find by name
-            users = User.get_all()
-            for u in users:
-                if u.nama is not None and form.email.data and u.nama.lower() == form.email.data.lower():
-                    user = u
-                    break
+            user = User.get_by_name(form.email.data)
 
         if user and user.check_password(form.password.data):
             login_user(user)
@@ -223,6 +226,21 @@ def admin_users():
     users = User.get_all()
     return render_template('admin/users.html', users=users)
 
+@app.route('/admin/cache-stats')
+@login_required
+@admin_required
+def admin_cache_stats():
+    """Per-worker cache counters, useful to confirm caching under gunicorn"""
+    return jsonify({
+        'books': Book.cache_stats(),
+        'users': User.cache_stats(),
+        'user_sessions': User.session_cache_stats(),
+        'recommendations': Book.recommendation_cache_stats(),
+        'gemini': gemini.stats() if gemini is not None else None,
+        'nlp_responses': nlp_response_cache.stats(),
+        'nlp_semantic': semantic_query_cache.stats()
+    })
+
 @app.route('/admin/nlp')
 @login_required
 @admin_required
@@ -235,7 +253,24 @@ def admin_nlp():
     else:
         masked_key = ''
     
-    return render_template('admin/nlp.html', current_api_key=masked_key)
+    return render_template('admin/nlp.html', current_api_key=masked_key,
+                           semantic_threshold=Settings.get_nlp_semantic_threshold(),
+                           semantic_stats=semantic_query_cache.stats(),
+                           response_stats=nlp_response_cache.stats())
+
+@app.route('/admin/nlp/semantic-cache', methods=['POST'])
+@login_required
+@admin_required
+def admin_update_semantic_cache():
+    try:
+        threshold = float(request.form.get('semantic_threshold', ''))
+        if not 0.5 <= threshold <= 1.0:
+            raise ValueError
+        Settings.update_nlp_semantic_threshold(threshold)
+        flash('Ambang cache semantik berhasil diupdate!', 'success')
+    except ValueError:
+        flash('Ambang cache semantik harus berupa angka antara 0.5 dan 1.0!', 'danger')
+    return redirect(url_for('admin_nlp'))
 
 @app.route('/admin/update-api-key', methods=['POST'])
 @login_required
@@ -248,8 +283,10 @@ def admin_update_api_key():
         return redirect(url_for('admin_nlp'))
     
     try:
-        # Update environment variable
+        # Update environment variable; the shared Gemini client is rebuilt for the new key
         os.environ['GEMINI_API_KEY'] = api_key
+        if gemini is not None:
+            gemini.warm_up()
         
         # Save to .env file for persistence
         env_file_path = '.env'
@@ -288,6 +325,7 @@ def admin_ai_generate():
     form = AIGenerateForm()
     extracted_data = None
     preview_image = None
+    cover_region = None
 
     if form.validate_on_submit():
         try:
@@ -337,9 +375,10 @@ def admin_ai_generate():
 
             preview_image = f"/static/uploads/books/{filename}"
 
-            # Initialize Gemini service and extract book information
-            gemini_service = GeminiBookRecommendationService()
-            result = gemini_service.extract_book_info_from_image(image_data, mime_type=mime_type)
+            # Extract book information and locate the cover concurrently
+            gemini_service = gemini.get_async_service()
+            result, cover_region = async_bridge.run(gemini_service.analyze_cover(image_data, mime_type=mime_type),
+                                                    timeout=gemini_service.deadline + 5)
 
             if 'error' in result:
                 flash(f'Gagal menganalisis gambar: {result["error"]}', 'danger')
@@ -353,7 +392,8 @@ def admin_ai_generate():
     return render_template('admin/ai_generate.html', 
                          form=form, 
                          extracted_data=extracted_data,
-                         preview_image=preview_image)
+                         preview_image=preview_image,
+                         cover_region=cover_region)
 
 @app.route('/admin/ai-generate/upload-cropped', methods=['POST'])
 @login_required
@@ -502,10 +542,11 @@ def regenerate_book_info():
         mime_type = mime_type_map[image_type]
 
         # Initialize Gemini service
-        gemini_service = GeminiBookRecommendationService()
+        gemini_service = gemini.get_async_service()
 
         # Extract book information
-        result = gemini_service.extract_book_info_from_image(image_data, mime_type=mime_type)
+        result = async_bridge.run(gemini_service.extract_book_info_from_image(image_data, mime_type=mime_type),
+                                  timeout=gemini_service.deadline + 5)
 
         if 'error' in result:
             return jsonify({'error': result['error']}), 400
@@ -531,6 +572,19 @@ def admin_settings():
                 flash('Nilai pengaturan rekomendasi tidak valid!', 'danger')
             return redirect(url_for('admin_settings'))
 
+        # Handle NLP prompt size settings
+        elif 'nlp_candidate_count' in request.form and 'nlp_description_length' in request.form:
+            try:
+                candidate_count = int(request.form.get('nlp_candidate_count', 30))
+                description_length = int(request.form.get('nlp_description_length', 500))
+                if candidate_count < 1 or description_length < 0:
+                    raise ValueError
+                Settings.update_nlp_prompt_settings(candidate_count, description_length)
+                flash('Pengaturan prompt AI berhasil diupdate!', 'success')
+            except ValueError:
+                flash('Nilai pengaturan prompt AI tidak valid!', 'danger')
+            return redirect(url_for('admin_settings'))
+
         # Handle maintenance mode toggle
         else:
             maintenance_mode = 'maintenance_mode' in request.form
@@ -543,11 +597,15 @@ def admin_settings():
     maintenance_status = Settings.is_maintenance_mode()
     quick_count = Settings.get_quick_recommendations_count()
     personal_count = Settings.get_personal_recommendations_count()
+    nlp_candidate_count = Settings.get_nlp_candidate_count()
+    nlp_description_length = Settings.get_nlp_description_length()
 
     return render_template('admin/settings.html', 
                          maintenance_status=maintenance_status,
                          quick_count=quick_count,
-                         personal_count=personal_count)
+                         personal_count=personal_count,
+                         nlp_candidate_count=nlp_candidate_count,
+                         nlp_description_length=nlp_description_length)
 
 # Book Management Routes
 @app.route('/admin/books/add', methods=['GET', 'POST'])
@@ -636,8 +694,7 @@ def add_user():
         if form.role.data != 'pengguna':
             user = User.get_by_email(form.email.data)
             if user:
-                user.role = form.role.data
-                user.save()
+                user.update(role=form.role.data)
 
         flash('Pengguna berhasil ditambahkan!', 'success')
         return redirect(url_for('admin_users'))
@@ -692,18 +749,29 @@ def delete_user(user_id):
     flash('Pengguna berhasil dihapus!', 'success')
     return jsonify({'success': True, 'message': 'Pengguna berhasil dihapus!'})
 
+# Sampling for quick recommendations: unset (uniform), 'recency' or 'popularity'
+QUICK_RECOMMENDATIONS_WEIGHTING = os.environ.get('QUICK_RECOMMENDATIONS_WEIGHTING') or None
+# How many recently shown book ids are remembered per session
+RECENT_BOOKS_WINDOW = int(os.environ.get('RECENT_BOOKS_WINDOW', 30))
+
 @app.route('/')
 def home():
     # Get quick recommendations using settings
+    # Books shown on the last few visits are skipped so refreshing brings new ones
+    recent = session.get('recent_books', [])
     quick_count = Settings.get_quick_recommendations_count()
-    quick_recommendations = Book.get_random(quick_count)
+    quick_recommendations = Book.get_random(quick_count, exclude=recent, weighting=QUICK_RECOMMENDATIONS_WEIGHTING)
+    shown = [book.id for book in quick_recommendations]
 
     # Get personalized recommendations using settings
     personal_count = Settings.get_personal_recommendations_count()
     if current_user.is_authenticated:
-        personal_recommendations = Book.get_recommendations_for_user(current_user)[:personal_count]
+        personal_recommendations = Book.get_recommendations_for_user(current_user, personal_count)
     else:
-        personal_recommendations = Book.get_random(personal_count)
+        personal_recommendations = Book.get_random(personal_count, exclude=recent + shown,
+                                                   weighting=QUICK_RECOMMENDATIONS_WEIGHTING)
+        shown += [book.id for book in personal_recommendations]
+    session['recent_books'] = (recent + shown)[-RECENT_BOOKS_WINDOW:]
 
     return render_template('home.html', 
                          quick_recommendations=quick_recommendations,
@@ -715,15 +783,27 @@ def jelajah():
     books = Book.get_all()
     return render_template('jelajah.html', books=books)
 
+@app.route('/api/autocomplete')
+@login_required
+def autocomplete():
+    """Instant title/author lookup for the Jelajah search box"""
+    query = request.args.get('q', '').strip()
+    limit = min(request.args.get('limit', 8, type=int) or 8, 20)
+    books = Book.autocomplete(query, limit) if query else []
+    return jsonify({
+        'results': [{
+            'id': book.id,
+            'judul': book.judul,
+            'penulis': book.penulis,
+            'foto': book.foto
+        } for book in books]
+    })
+
 @app.route('/profil')
 @login_required
 def profil():
     # Get user's favorite books
-    favorite_books = []
-    for book_id in current_user.favorites:
-        book = Book.get(book_id)
-        if book:
-            favorite_books.append(book)
+    favorite_books = Book.get_many(current_user.favorites)
 
     return render_template('profil.html', favorite_books=favorite_books)
 
@@ -755,6 +835,7 @@ def toggle_favorite(book_id):
         current_user.add_favorite(book_id)
         message = 'Buku ditambahkan ke favorit'
         is_favorite = True
+    Book.invalidate_recommendations(current_user.id)
 
     return jsonify({
         'message': message,
@@ -766,6 +847,53 @@ def maintenance_page():
     """Dedicated maintenance page route"""
     return render_template('maintenance.html'), 503
 
+# Fuzzy title/author matches scoring at least this much (0..1) are answered without Gemini
+FUZZY_ANSWER_THRESHOLD = float(os.environ.get('FUZZY_ANSWER_THRESHOLD', 0.8))
+# Most books returned for a query answered from the fuzzy index
+FUZZY_ANSWER_LIMIT = 8
+# Gemini answers shared by all workers on this machine
+nlp_response_cache = nlp_cache.from_environment()
+# Gemini answers matched by query similarity, so paraphrases reuse them too
+semantic_query_cache = semantic_cache.from_environment()
+
+def nlp_prompt_books(user_query, all_books, fuzzy_matches, candidate_count, description_length):
+    """Candidate books sent to Gemini for ``user_query``, as prompt dicts"""
+    # Pre-select candidates locally (BM25) so the prompt stays the same size as the catalog grows
+    candidates = Book.search(user_query, candidate_count)
+    # BM25 only knows exact words; add books found despite typos
+    seen = {book.id for book in candidates}
+    for book, _, _ in fuzzy_matches:
+        if len(candidates) >= candidate_count:
+            break
+        if book.id not in seen:
+            seen.add(book.id)
+            candidates.append(book)
+    if not candidates and not bm25.NUMPY_AVAILABLE:
+        candidates = all_books
+    elif len(candidates) < candidate_count:
+        # Too few keyword matches; let Gemini judge some other books as well
+        seen = {book.id for book in candidates}
+        candidates += Book.get_random(candidate_count - len(candidates), exclude=seen)
+
+    # Convert books to dict format for Gemini
+    books_data = []
+    prompt_chars = 0
+    for book in candidates:
+        description = book.deskripsi_singkat[:description_length]
+        prompt_chars += bm25.prompt_chars(book, description)
+        books_data.append({
+            'id': book.id,
+            'judul': book.judul,
+            'penulis': book.penulis,
+            'tag': book.tag,
+            'deskripsi_singkat': description
+        })
+    full_prompt_chars = Book.search_index().full_prompt_chars if bm25.NUMPY_AVAILABLE else prompt_chars
+    logging.info(f"NLP prompt: {len(books_data)} of {len(all_books)} books, "
+                 f"~{bm25.estimate_tokens(prompt_chars)} tokens "
+                 f"(saved ~{bm25.estimate_tokens(full_prompt_chars - prompt_chars)})")
+    return books_data
+
 @app.route('/nlp-recommendation', methods=['POST'])
 @login_required
 def nlp_recommendation():
@@ -794,37 +922,115 @@ def nlp_recommendation():
 
         logging.info(f"Found {len(all_books)} books in database")
 
-        # Convert books to dict format for Gemini
-        books_data = []
-        for book in all_books:
-            books_data.append({
+        def book_result(book):
+            return {
                 'id': book.id,
                 'judul': book.judul,
                 'penulis': book.penulis,
                 'tag': book.tag,
-                'deskripsi_singkat': book.deskripsi_singkat
-            })
+                'foto': book.foto,
+                'deskripsi_singkat': book.deskripsi_singkat,
+                'is_favorite': current_user.is_favorite(book.id) if current_user.is_authenticated else False
+            }
 
-        # Check if Gemini service is available
-        try:
-            gemini_service = GeminiBookRecommendationService()
-            logging.info("Gemini service initialized successfully")
-        except Exception as init_error:
-            logging.error(f"Failed to initialize Gemini service: {str(init_error)}")
-            # Return user-friendly error message
+        def stream_recommendations(gemini_service, books_data):
+            """NDJSON events: each book as soon as Gemini names it, then the explanation and similar books"""
+            def event(**data):
+                return json.dumps(data, ensure_ascii=False) + '\n'
+
+            started = time.perf_counter()
+            shown = []
+            try:
+                for kind, value in async_bridge.iterate(
+                        gemini_service.stream_book_recommendations(user_query, books_data),
+                        timeout=gemini_service.deadline + 5):
+                    if kind == 'book':
+                        book = Book.get(value.get('id'))
+                        if book is None or book.id in shown:
+                            continue
+                        if not shown:
+                            logging.info(f"First streamed recommendation after {time.perf_counter() - started:.2f}s")
+                        shown.append(book.id)
+                        yield event(type='book', book=book_result(book), reason=value.get('reason', ''))
+                        continue
+
+                    if 'error' in value:
+                        logging.error(f"Gemini returned error: {value['error']}")
+                        yield event(type='error', error="Layanan AI mengalami gangguan. Silakan coba dengan kata kunci yang berbeda atau coba lagi nanti.")
+                        return
+                    nlp_response_cache.put(user_query, cache_version, value)
+                    semantic_query_cache.put(user_query, cache_version, value)
+                    yield event(type='explanation',
+                                explanation=value.get('explanation', 'Berikut adalah rekomendasi buku berdasarkan pertanyaan Anda:'))
+                    similar_books = Book.get_similar(shown[0], limit=3) if shown else []
+                    yield event(type='similar', books=[book_result(book) for book in similar_books])
+                    logging.info(f"Streamed NLP recommendation in {time.perf_counter() - started:.2f}s")
+                    yield event(type='done')
+            except Exception as e:
+                logging.error(f"Unexpected error in streamed NLP recommendation: {str(e)}")
+                yield event(type='error', error=f"Terjadi kesalahan yang tidak terduga: {str(e)}")
+
+        candidate_count = Settings.get_nlp_candidate_count()
+        description_length = Settings.get_nlp_description_length()
+
+        # A (possibly misspelled) title or author lookup is answered locally
+        fuzzy_matches = Book.fuzzy_search(user_query, candidate_count)
+        direct_matches = [book for book, _, title_score in fuzzy_matches if title_score >= FUZZY_ANSWER_THRESHOLD]
+        if direct_matches:
+            direct_matches = direct_matches[:FUZZY_ANSWER_LIMIT]
+            logging.info(f"Answered NLP query from the fuzzy index: {len(direct_matches)} books")
             return jsonify({
-                "error": "Layanan AI rekomendasi sedang tidak tersedia. Silakan coba lagi dalam beberapa saat."
-            }), 503
+                'books': [book_result(book) for book in direct_matches],
+                'reasons': {book.id: 'Judul atau penulis cocok dengan pencarian Anda' for book in direct_matches},
+                'explanation': f'Buku yang paling cocok dengan "{user_query}":',
+                'similar_books': [book_result(book) for book in Book.get_similar(direct_matches[0].id, limit=3)]
+            })
 
-        # Get recommendations from Gemini
-        logging.info("Getting recommendations from Gemini...")
-        recommendation_result = gemini_service.get_book_recommendations(user_query, books_data)
+        # Same question against the same catalog and prompt settings: reuse the earlier answer
+        cache_version = f"{Book.catalog_signature()}:{candidate_count}:{description_length}"
+        recommendation_result = nlp_response_cache.get(user_query, cache_version)
+        if recommendation_result is not None:
+            logging.info("Answered NLP query from the response cache")
+            semantic_query_cache.put(user_query, cache_version, recommendation_result)
+        else:
+            recommendation_result = semantic_query_cache.get(user_query, cache_version,
+                                                             Settings.get_nlp_semantic_threshold())
+            if recommendation_result is not None:
+                logging.info("Answered NLP query from a similar cached question")
+                nlp_response_cache.put(user_query, cache_version, recommendation_result)
+        if recommendation_result is None:
+            books_data = nlp_prompt_books(user_query, all_books, fuzzy_matches, candidate_count, description_length)
 
-        if 'error' in recommendation_result:
-            logging.error(f"Gemini returned error: {recommendation_result['error']}")
-            return jsonify({
-                "error": "Layanan AI mengalami gangguan. Silakan coba dengan kata kunci yang berbeda atau coba lagi nanti."
-            }), 503
+            # Check if Gemini service is available
+            try:
+                gemini_service = gemini.get_async_service()
+                logging.info("Gemini service initialized successfully")
+            except Exception as init_error:
+                logging.error(f"Failed to initialize Gemini service: {str(init_error)}")
+                # Return user-friendly error message
+                return jsonify({
+                    "error": "Layanan AI rekomendasi sedang tidak tersedia. Silakan coba lagi dalam beberapa saat."
+                }), 503
+
+            if 'application/x-ndjson' in request.headers.get('Accept', ''):
+                # Stream the answer so the first card shows before Gemini finishes
+                return Response(stream_with_context(stream_recommendations(gemini_service, books_data)),
+                                mimetype='application/x-ndjson',
+                                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+            # Get recommendations from Gemini
+            logging.info("Getting recommendations from Gemini...")
+            recommendation_result = async_bridge.run(gemini_service.get_book_recommendations(user_query, books_data),
+                                                     timeout=gemini_service.deadline + 5)
+
+            if 'error' in recommendation_result:
+                logging.error(f"Gemini returned error: {recommendation_result['error']}")
+                return jsonify({
+                    "error": "Layanan AI mengalami gangguan. Silakan coba dengan kata kunci yang berbeda atau coba lagi nanti."
+                }), 503
+
+            nlp_response_cache.put(user_query, cache_version, recommendation_result)
+            semantic_query_cache.put(user_query, cache_version, recommendation_result)
 
         # Process recommended books
         recommended_books = []
@@ -832,48 +1038,17 @@ def nlp_recommendation():
 
         if 'recommended_books' in recommendation_result:
             logging.info(f"Found {len(recommendation_result['recommended_books'])} recommendations")
-            for rec in recommendation_result['recommended_books']:
-                book_id = rec.get('id')
-                book = Book.get(book_id)
-                if book:
-                    book_dict = {
-                        'id': book.id,
-                        'judul': book.judul,
-                        'penulis': book.penulis,
-                        'tag': book.tag,
-                        'foto': book.foto,
-                        'deskripsi_singkat': book.deskripsi_singkat,
-                        'is_favorite': current_user.is_favorite(book.id) if current_user.is_authenticated else False
-                    }
-                    recommended_books.append(book_dict)
-                    reasons[book.id] = rec.get('reason', '')
+            rec_reasons = {rec.get('id'): rec.get('reason', '') for rec in recommendation_result['recommended_books']}
+            for book in Book.get_many(list(rec_reasons)):
+                recommended_books.append(book_result(book))
+                reasons[book.id] = rec_reasons[book.id]
 
         # Get similar books for the first recommended book
         similar_books = []
         if recommended_books:
-            first_book_dict = {
-                'id': recommended_books[0]['id'],
-                'judul': recommended_books[0]['judul'],
-                'penulis': recommended_books[0]['penulis'],
-                'tag': recommended_books[0]['tag'],
-                'deskripsi_singkat': recommended_books[0]['deskripsi_singkat']
-            }
-
-            similar_results = gemini_service.find_similar_books(first_book_dict, books_data, limit=3)
-
-            for sim in similar_results:
-                book_id = sim.get('id')
-                book = Book.get(book_id)
-                if book:
-                    similar_books.append({
-                        'id': book.id,
-                        'judul': book.judul,
-                        'penulis': book.penulis,
-                        'tag': book.tag,
-                        'foto': book.foto,
-                        'deskripsi_singkat': book.deskripsi_singkat,
-                        'is_favorite': current_user.is_favorite(book.id) if current_user.is_authenticated else False
-                    })
+            # Local content-similarity index instead of a second Gemini round trip
+            for book in Book.get_similar(recommended_books[0]['id'], limit=3):
+                similar_books.append(book_result(book))
 
         logging.info("Successfully processed NLP recommendation")
         response_data = {
@@ -0,0 +1,347 @@
+"""Speed and quality of the recommendation entry points on synthetic catalogs.
+
+Each catalog size runs in a fresh process against an in-memory storage
+backend filled with synthetic books (tags from the real BookForm
+vocabulary, Zipf-like popularity) and users whose favorites lean towards
+one or two preferred tags.  For every size the report records:
+
+- latency of Book.get_recommendations_for_user (cold, uncached, cached),
+  Book.get_by_genre and Book.get_random (uniform and popularity weighted)
+- peak RSS of the process and how much the first calls added to it
+- hit-rate@k and MRR of the personal recommendations on one held-out
+  favorite per evaluation user, next to a random baseline
+
+Results are written as JSON and markdown; pass an earlier JSON report to
+``--compare`` to add a change column to the markdown.
+
+Usage:
+    python -m benchmarks.recommendations [--sizes 1000 10000 100000 1000000] [--users 20000]
+        [--calls 200] [--eval-users 500] [--output benchmarks/reports/recommendations]
+        [--compare benchmarks/reports/recommendations-<commit>.json]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from app.storage.base import StorageBackend
+
+# The models are imported inside the worker process only, after the
+# in-memory storage is installed, so every size starts from a cold catalog.
+
+HIT_RATE_KS = (5, 10, 20)
+TITLE_WORDS = ['Pengantar', 'Dasar-Dasar', 'Panduan Praktis', 'Teori dan Aplikasi', 'Belajar',
+               'Konsep', 'Mahir', 'Studi Kasus', 'Metode', 'Pedoman']
+
+
+def tag_vocabulary():
+    """Tags offered by the admin book form, i.e. the vocabulary real books use"""
+    from app.forms.book import BookForm
+    return [value for value, _ in BookForm.tag.kwargs['choices']]
+
+
+class MemoryStorage(StorageBackend):
+    """Read-only backend serving the synthetic collections from memory"""
+
+    name = 'memory'
+
+    def __init__(self, books, users):
+        self._books = books
+        self._descriptions = {book['id']: book['deskripsi_singkat'] for book in books}
+        self._users = users
+        self._settings = None
+        self._versions = {'books': 0, 'users': 0, 'settings': 0}
+
+    def signature(self, collection):
+        return self._versions[collection]
+
+    def load_books(self):
+        return self._books
+
+    def load_description(self, book_id):
+        return self._descriptions.get(book_id)
+
+    def load_users(self):
+        return self._users
+
+    def load_settings(self):
+        return self._settings
+
+    def save_settings(self, settings):
+        self._settings = dict(settings)
+        self._versions['settings'] += 1
+        return self._versions['settings']
+
+
+def synthetic_data(size, user_count, eval_users, seed=0):
+    """(books, users, held-out favorite per evaluation user id)"""
+    rng = random.Random(seed)
+    tags = tag_vocabulary()
+
+    books = []
+    by_tag = {tag: [] for tag in tags}
+    for i in range(size):
+        book_tags = rng.sample(tags, rng.randint(1, 3))
+        for tag in book_tags:
+            by_tag[tag].append(i)
+        books.append({
+            'id': str(i),
+            'judul': f'{rng.choice(TITLE_WORDS)} {book_tags[0]} Jilid {i}',
+            'penulis': f'Penulis {rng.randrange(size // 20 + 1)}',
+            'tag': book_tags,
+            'foto': f'/static/uploads/books/buku_{i}.jpg',
+            'deskripsi_singkat': f"Buku tentang {', '.join(book_tags).lower()} untuk mahasiswa dan praktisi.",
+        })
+
+    # Zipf-like popularity: a few books collect most of the favorites
+    popularity = [1.0 / (rank + 1) ** 0.8 for rank in range(size)]
+    rng.shuffle(popularity)
+
+    def cumulative(ordinals):
+        total, totals = 0.0, []
+        for ordinal in ordinals:
+            total += popularity[ordinal]
+            totals.append(total)
+        return totals
+
+    tag_weights = {tag: cumulative(ordinals) for tag, ordinals in by_tag.items() if ordinals}
+    all_weights = cumulative(range(size))
+
+    users, held_out = [], {}
+    for i in range(user_count):
+        preferred = rng.sample(list(tag_weights), min(2, len(tag_weights)))
+        favorites = []
+        for _ in range(rng.randint(2, 12)):
+            if rng.random() < 0.8:
+                tag = rng.choice(preferred)
+                ordinal = rng.choices(by_tag[tag], cum_weights=tag_weights[tag])[0]
+            else:
+                ordinal = rng.choices(range(size), cum_weights=all_weights)[0]
+            if str(ordinal) not in favorites:
+                favorites.append(str(ordinal))
+        user_id = f'{i:08d}-0000-4000-8000-000000000000'
+        if len(held_out) < eval_users and len(favorites) >= 2:
+            held_out[user_id] = favorites.pop()
+        users.append({
+            'id': user_id,
+            'nama': f'Pengguna {i}',
+            'email': f'pengguna{i}@example.com',
+            'password_hash': 'x',
+            'favorites': favorites,
+            'role': 'pengguna',
+        })
+    return books, users, held_out
+
+
+def timings(call, arguments):
+    """Latency summary (ms) of ``call(argument)`` over ``arguments``"""
+    samples = []
+    for argument in arguments:
+        started = time.perf_counter()
+        call(argument)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        'calls': len(samples),
+        'mean_ms': statistics.fmean(samples),
+        'p50_ms': samples[len(samples) // 2],
+        'p95_ms': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+    }
+
+
+def genre_books(book_model, tag):
+    """Book.get_by_genre for one tag; an empty result would time a no-op"""
+    books = book_model.get_by_genre([tag])
+    assert books, f"no books tagged {tag!r}"
+    return books
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def run_size(size, user_count, calls, eval_users, seed):
+    """Worker: benchmark one catalog size in a fresh process"""
+    started = time.perf_counter()
+    books, users, held_out = synthetic_data(size, user_count, eval_users, seed)
+    generated = time.perf_counter() - started
+
+    from app.models.book import Book
+    from app.models.user import User
+    from app.storage import set_storage
+    set_storage(MemoryStorage(books, users))
+    del books
+
+    rng = random.Random(seed + 1)
+    tags = tag_vocabulary()
+    rss_before = peak_rss_mb()
+    results = {'books': size, 'users': user_count, 'generate_s': generated, 'entry_points': {}}
+    entry_points = results['entry_points']
+
+    # First calls build the catalog cache and the indexes behind each entry point
+    user_ids = [user['id'] for user in users if user['favorites']]
+    started = time.perf_counter()
+    Book.get_all()
+    User.get_all()
+    results['load_s'] = time.perf_counter() - started
+    for name, call in (('get_recommendations_for_user', lambda: Book.get_recommendations_for_user(User.get(user_ids[0]))),
+                       ('get_by_genre', lambda: genre_books(Book, tags[0])),
+                       ('get_random', lambda: Book.get_random(6)),
+                       ('get_random (popularity)', lambda: Book.get_random(6, weighting='popularity'))):
+        started = time.perf_counter()
+        call()
+        entry_points[name] = {'cold_ms': (time.perf_counter() - started) * 1000}
+
+    sample = rng.sample(user_ids, min(calls, len(user_ids)))
+    entry_points['get_recommendations_for_user'].update(
+        timings(lambda user_id: Book.get_recommendations_for_user(User.get(user_id)), sample))
+    entry_points['get_recommendations_for_user (cached)'] = \
+        timings(lambda user_id: Book.get_recommendations_for_user(User.get(user_id)), sample)
+    entry_points['get_by_genre'].update(
+        timings(lambda tag: genre_books(Book, tag), [rng.choice(tags) for _ in range(calls)]))
+    entry_points['get_random'].update(timings(lambda _: Book.get_random(6), range(calls)))
+    entry_points['get_random (popularity)'].update(
+        timings(lambda _: Book.get_random(6, weighting='popularity'), range(calls)))
+    results['peak_rss_mb'] = peak_rss_mb()
+    results['index_rss_mb'] = results['peak_rss_mb'] - rss_before
+
+    # Offline quality: is the held-out favorite among the top k recommendations?
+    top_k = max(HIT_RATE_KS)
+    hits = {k: 0 for k in HIT_RATE_KS}
+    reciprocal_ranks = 0.0
+    for user_id, book_id in held_out.items():
+        recommended = [book.id for book in Book.get_recommendations_for_user(User.get(user_id), top_k)]
+        if book_id in recommended:
+            rank = recommended.index(book_id) + 1
+            reciprocal_ranks += 1.0 / rank
+            for k in HIT_RATE_KS:
+                hits[k] += rank <= k
+    evaluated = len(held_out) or 1
+    results['quality'] = {
+        'eval_users': len(held_out),
+        **{f'hit_rate@{k}': hits[k] / evaluated for k in HIT_RATE_KS},
+        'mrr': reciprocal_ranks / evaluated,
+        **{f'random_hit_rate@{k}': k / size for k in HIT_RATE_KS},
+    }
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def markdown(report, baseline=None):
+    """Markdown tables for ``report``, with the change against ``baseline`` if given"""
+    previous = {row['books']: row for row in (baseline or {}).get('results', [])}
+    against = f" (change vs {baseline.get('commit') or 'baseline'})" if baseline else ''
+    lines = [f"# Recommendation benchmark {report['commit'] or ''}".rstrip(), '',
+             f"{report['created']} · Python {report['python']} · {report['users']} users · "
+             f"{report['calls']} calls per entry point", '',
+             f'## Latency{against}', '',
+             '| books | entry point | cold ms | mean ms | p50 ms | p95 ms |',
+             '|---:|---|---:|---:|---:|---:|']
+
+    def cell(row, old, *path):
+        value = row
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+        if value is None:
+            return '–'
+        text = f'{value:.3f}'
+        for key in path:
+            old = old.get(key) if isinstance(old, dict) else None
+        if old:
+            text += f' ({(value - old) / old:+.0%})'
+        return text
+
+    for row in report['results']:
+        old = previous.get(row['books'], {})
+        for name in row['entry_points']:
+            cells = [cell(row, old, 'entry_points', name, column)
+                     for column in ('cold_ms', 'mean_ms', 'p50_ms', 'p95_ms')]
+            lines.append(f"| {row['books']:,} | `{name}` | " + ' | '.join(cells) + ' |')
+
+    lines += ['', '## Memory and load', '',
+              '| books | load s | peak RSS MB | added by first calls MB |', '|---:|---:|---:|---:|']
+    for row in report['results']:
+        old = previous.get(row['books'], {})
+        lines.append(f"| {row['books']:,} | {cell(row, old, 'load_s')} | {cell(row, old, 'peak_rss_mb')} "
+                     f"| {cell(row, old, 'index_rss_mb')} |")
+
+    columns = [f'hit_rate@{k}' for k in HIT_RATE_KS] + ['mrr']
+    lines += ['', '## Quality (held-out favorites)', '',
+              '| books | eval users | ' + ' | '.join(columns) + f' | random hit_rate@{max(HIT_RATE_KS)} |',
+              '|---:|---:|' + '---:|' * (len(columns) + 1)]
+    for row in report['results']:
+        old = previous.get(row['books'], {})
+        cells = [cell(row, old, 'quality', column) for column in columns]
+        lines.append(f"| {row['books']:,} | {row['quality']['eval_users']} | " + ' | '.join(cells) +
+                     f" | {row['quality'][f'random_hit_rate@{max(HIT_RATE_KS)}']:.4f} |")
+    return '\n'.join(lines) + '\n'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--calls', type=int, default=200, help='timed calls per entry point')
+    parser.add_argument('--eval-users', type=int, default=500, help='users with a held-out favorite')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None,
+                        help='report path without extension (default: benchmarks/reports/recommendations-<commit>)')
+    parser.add_argument('--compare', default=None, help='earlier JSON report to compare against')
+    args = parser.parse_args(argv)
+
+    commit = git_commit()
+    report = {
+        'commit': commit,
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'users': args.users,
+        'calls': args.calls,
+        'results': [],
+    }
+    # Keep derived files (similarity neighbours, precomputed results) away from data/
+    os.environ['DATA_DIR'] = tempfile.mkdtemp(prefix='rekobuku-bench-')
+    context = multiprocessing.get_context('spawn')
+    for size in args.sizes:
+        print(f'{size:,} books...', flush=True)
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            result = executor.submit(run_size, size, args.users, args.calls, args.eval_users, args.seed).result()
+        report['results'].append(result)
+        recommendations = result['entry_points']['get_recommendations_for_user']
+        print(f"  recommendations p50 {recommendations['p50_ms']:.2f} ms, "
+              f"hit_rate@10 {result['quality']['hit_rate@10']:.3f}, peak RSS {result['peak_rss_mb']:.0f} MB",
+              flush=True)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+    output = args.output or os.path.join('benchmarks', 'reports', f"recommendations-{commit or 'local'}")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(f'{output}.json', 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    with open(f'{output}.md', 'w', encoding='utf-8') as f:
+        f.write(markdown(report, baseline))
+    print(f'Wrote {output}.json and {output}.md')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
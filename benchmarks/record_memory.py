@@ -0,0 +1,123 @@
+"""Memory used per Book/User record in the cached catalog.
+
+Compares the previous dict-backed records (every Book field stored twice
+under its Indonesian and English name) with the current slot-based ones.
+
+Usage:
+    python -m benchmarks.record_memory [--sizes 10000 100000]
+"""
+import argparse
+import gc
+import json
+import random
+import tracemalloc
+
+from app.models.book import Book
+from app.models.user import User
+
+TAGS = ['Algoritma', 'Struktur Data', 'Pemrograman', 'Basis Data', 'Akuntansi',
+        'Keuangan', 'Pemasaran', 'Jaringan Komputer', 'Data Science', 'Optimasi']
+
+
+class LegacyBook:
+    """Book record as it was before slots: dict-backed, with alias attributes"""
+
+    def __init__(self, id, judul, penulis, tag, foto, deskripsi_singkat):
+        self.id = id
+        self.judul = judul
+        self.penulis = penulis
+        self.tag = tag
+        self.foto = foto
+        self.deskripsi_singkat = deskripsi_singkat
+        self.title = judul
+        self.author = penulis
+        self.genre = tag
+        self.cover_image = foto
+        self.description = deskripsi_singkat
+
+
+class LegacyUser:
+    """User record as it was before slots (a plain UserMixin subclass)"""
+
+    def __init__(self, id, nama, email, password_hash, favorites=None, profile_image=None, role='pengguna'):
+        self.id = id
+        self.nama = nama
+        self.email = email
+        self.password_hash = password_hash
+        self.favorites = favorites or []
+        self.profile_image = profile_image or 'https://via.placeholder.com/40x40/6b7280/ffffff?text=User'
+        self.role = role
+
+
+def synthetic_books_json(count, description_length, seed=0):
+    rng = random.Random(seed)
+    return json.dumps([{
+        'id': str(i),
+        'judul': f'Judul Buku Sintetis Nomor {i}',
+        'penulis': f'Penulis {rng.randrange(count // 10 + 1)}',
+        'tag': rng.sample(TAGS, rng.randint(2, 4)),
+        'foto': f'/static/uploads/books/buku_{i}.jpg',
+        'deskripsi_singkat': 'x' * description_length,
+    } for i in range(count)])
+
+
+def synthetic_users_json(count, seed=0):
+    rng = random.Random(seed)
+    return json.dumps([{
+        'id': f'{i:08d}-0000-4000-8000-000000000000',
+        'nama': f'Pengguna {i}',
+        'email': f'pengguna{i}@example.com',
+        'password_hash': 'scrypt:32768:8:1$' + 'a' * 16 + '$' + 'b' * 128,
+        'favorites': [str(rng.randrange(1000)) for _ in range(rng.randint(0, 10))],
+        'profile_image': 'https://via.placeholder.com/40x40/6b7280/ffffff?text=User',
+        'role': 'pengguna',
+    } for i in range(count)])
+
+
+def retained_bytes(payload, build):
+    """Bytes still allocated after parsing ``payload`` and keeping only build(rows)"""
+    gc.collect()
+    tracemalloc.start()
+    rows = json.loads(payload)
+    records = build(rows)
+    del rows
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del records
+    return retained
+
+
+def run(sizes, description_length=3500):
+    results = []
+    for count in sizes:
+        books = synthetic_books_json(count, description_length)
+        users = synthetic_users_json(count)
+        variants = {
+            'book, dict + aliases (before)': (books, lambda rows: [LegacyBook(**row) for row in rows]),
+            'book, slots (after)': (books, lambda rows: [Book(**row) for row in rows]),
+            'book, slots + lazy description': (books, lambda rows: [
+                Book(row['id'], row['judul'], row['penulis'], row['tag'], row['foto'], None,
+                     row['deskripsi_singkat'][:100]) for row in rows]),
+            'user, dict (before)': (users, lambda rows: [LegacyUser(**row) for row in rows]),
+            'user, slots (after)': (users, lambda rows: [User(**row) for row in rows]),
+        }
+        for name, (payload, build) in variants.items():
+            retained = retained_bytes(payload, build)
+            results.append({'records': count, 'variant': name, 'bytes_per_record': retained / count})
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--description-length', type=int, default=3500)
+    args = parser.parse_args(argv)
+
+    print(f"{'records':>8}  {'variant':<32} {'bytes/record':>12}")
+    for row in run(args.sizes, args.description_length):
+        print(f"{row['records']:>8}  {row['variant']:<32} {row['bytes_per_record']:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
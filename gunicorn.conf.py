@@ -0,0 +1,11 @@
+# Gunicorn reads this file from the working directory automatically;
+# command-line options (bind address, reload) still come from the workflow.
+
+
+def post_worker_init(worker):
+    """Create the worker's shared Gemini client and open its connection before the first request"""
+    try:
+        from app.services import gemini_service
+    except ImportError:
+        return
+    gemini_service.warm_up()
@@ -0,0 +1,37 @@
+from app.services.semantic_cache import SemanticQueryCache
+
+THRESHOLD = 0.8
+ANSWER = {'recommended_books': [{'id': '1', 'relevance_score': 0.9, 'reason': ''}], 'explanation': ''}
+
+
+def cache_with(query):
+    cache = SemanticQueryCache(max_entries=16)
+    cache.put(query, 'v1', ANSWER)
+    return cache
+
+
+def test_paraphrase_reuses_answer():
+    cache = cache_with('buku tentang akuntansi dasar')
+    assert cache.get('belajar akuntansi dari dasar', 'v1', THRESHOLD) == ANSWER
+
+
+def test_typo_and_word_order_reuse_answer():
+    cache = cache_with('algoritma dan struktur data')
+    assert cache.get('struktur data dan algoritme', 'v1', THRESHOLD) == ANSWER
+
+
+def test_narrower_question_is_not_served():
+    # Cosine similarity of this pair is above the threshold, but the new query adds a topic
+    cache = cache_with('jaringan komputer')
+    assert cache.get('keamanan jaringan komputer', 'v1', THRESHOLD) is None
+    assert cache.near_misses == 1
+
+
+def test_broader_question_is_not_served():
+    cache = cache_with('keamanan jaringan komputer')
+    assert cache.get('jaringan komputer', 'v1', THRESHOLD) is None
+
+
+def test_other_catalog_version_is_not_served():
+    cache = cache_with('buku tentang akuntansi dasar')
+    assert cache.get('buku tentang akuntansi dasar', 'v2', THRESHOLD) is None